@@ -4,6 +4,8 @@
 # You can install it using: pip install PyYAML
 
 import argparse
+import contextlib
+import functools
 import yaml
 import os
 from pathlib import Path
@@ -14,7 +16,23 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(script_dir, 'utils'))
 sys.path.append(os.path.join(script_dir, 'modules'))
 
-from file_io import load_source_data, save_converted_data
+from file_io import (
+    load_source_data, write_converted_data, report_saved_file, save_root_yaml, save_bundle, remove_stale_shards,
+    list_input_sources, resolve_loader, LOADER_BACKENDS, ConvertedFileWriter
+)
+from source_cache import SourceCache, DEFAULT_MAX_BYTES
+from lazy_source import LazySourceData
+from source_filters import EntityFilter
+from source_sample import SourceSample
+from pipeline import run_pipeline, DEFAULT_QUEUE_SIZE
+from output_writer import (
+    ConvertedOutput, STREAM_FORMATS, DUMPER_BACKENDS, OUTPUT_FORMATS, OUTPUT_COMPRESSIONS, BUNDLE_FILE_NAME, is_stdout, resolve_dumper,
+    split_into_shards, output_file_name, root_importable_files, describe_contents, write_yaml_bundle, write_tar_stream
+)
+from output_manifest import MANIFEST_FILE_NAME, fingerprint_sources, manifest_entry, save_manifest
+from sqlite_sink import parse_sink, write_sqlite_sink
+from tabular_export import TABLE_FORMATS, save_tables
+from output_partition import PARTITION_KEYS, OutputPartitioner, partition_imports
 from summary_reporter import generate_summary
 from id_prefix import ensure_prefix
 
@@ -24,7 +42,7 @@ from dc_az_converter import convert as dc_az_convert
 from dc_converter import convert as dc_convert # Added DC converter
 from vpcs_converter import convert as vpcs_convert
 from subnets_converter import convert as subnets_convert
-from ecss_converter import convert as ecss_convert
+from ecss_converter import convert as ecss_convert, convert_entities as ecss_convert_entities
 from cluster_virtualization_converter import convert as cluster_virtualization_convert
 from cces_converter import convert as cces_convert
 from rdss_converter import convert as rdss_convert
@@ -62,6 +80,59 @@ CONVERTERS = {
     'elbs': elbs_convert, # Added ELB converter
 }
 
+# Source collections each converter reads (short names), used to start converters as soon as
+# their input is loaded in pipeline mode
+CONVERTER_SOURCES = {
+    'dc_region': (),
+    'dc_az': ('ecss', 'cces', 'rdss', 'dmss'),
+    'dcs': ('ecss', 'cces', 'rdss', 'dmss'),
+    'vpcs': ('vpcs', 'subnets', 'ecss', 'cces', 'rdss', 'dmss'),
+    'subnets': ('subnets', 'vpcs'),
+    'ecss': ('ecss',),
+    'cluster_virtualization': ('ecss',),
+    'cces': ('cces',),
+    'rdss': ('rdss',),
+    'nat_gateways': ('nat_gateways', 'subnets', 'ecss'),
+    'peerings': ('peerings',),
+    'vaults': ('vaults',),
+    'vpn_gateways': ('vpn_gateways', 'subnets', 'ecss'),
+    'vpn_connections': ('vpn_connections',),
+    'eips': ('eips', 'subnets', 'ecss', 'nat_gateways', 'elbs', 'cces', 'rdss', 'dmss'),
+    'dmss': ('dmss',),
+    'security_groups': ('security_groups',),
+    'branches': ('branches',),
+    'elbs': ('elbs', 'subnets', 'ecss'),
+}
+
+# Target entity types each converter produces, used to write a target file as soon as all
+# converters contributing to it have run in pipeline mode
+CONVERTER_TARGETS = {
+    'dc_region': ('seaf.ta.services.dc_region',),
+    'dc_az': ('seaf.ta.services.dc_az',),
+    'dcs': ('seaf.ta.services.dc',),
+    'vpcs': ('seaf.ta.services.network_segment', 'seaf.ta.components.network'),
+    'subnets': ('seaf.ta.services.network',),
+    'ecss': ('seaf.ta.components.server',),
+    'cluster_virtualization': ('seaf.ta.services.cluster_virtualization',),
+    'cces': ('seaf.ta.services.k8s',),
+    'rdss': ('seaf.ta.services.cluster',),
+    'nat_gateways': ('seaf.ta.components.network',),
+    'peerings': ('seaf.ta.services.logical_link',),
+    'vaults': ('seaf.ta.services.storage', 'seaf.ta.services.backup'),
+    'vpn_gateways': ('seaf.ta.components.network',),
+    'vpn_connections': ('seaf.ta.services.logical_link',),
+    'eips': ('seaf.ta.services.network', 'seaf.ta.services.network_segment', 'seaf.ta.services.network_links'),
+    'dmss': ('seaf.ta.services.cluster',),
+    'security_groups': ('seaf.ta.services.kb',),
+    'branches': ('seaf.ta.services.office',),
+    'elbs': ('seaf.ta.components.network',),
+}
+
+# Converters that can consume their source collection as a stream of (entity_id, details) pairs
+STREAM_CONVERTERS = {
+    'ecss': ecss_convert_entities,
+}
+
 def load_config(config_path):
     """Loads configuration from a YAML file."""
     if not os.path.exists(config_path):
@@ -74,18 +145,130 @@ def determine_prefix(source_data, override):
     return ensure_prefix(prefix=override, source_data=source_data)
 
 
-def main():
-    """Main function to run the conversion process."""
+def stream_convert(convert_entities, source_data, source_full_name):
+    """
+    Runs a streaming converter over one source collection read entity by entity.
+    Returns the converted data and the number of source entities consumed.
+    """
+    source_count = 0
 
-    # 1. Argument Parsing
+    def counted_entities():
+        nonlocal source_count
+        for entity_id, details in source_data.iter_entities(source_full_name):
+            source_count += 1
+            yield entity_id, details
+
+    return convert_entities(counted_entities(), source_data), source_count
+
+
+def find_source_name(source_data, entity_name):
+    """Returns the full source collection key for a short entity name (e.g. 'ecss'), or None."""
+    source_full_name = None
+    for key in source_data.keys():
+        if key.split('.')[-1] == entity_name:
+            source_full_name = key
+    return source_full_name
+
+
+def count_source_entities(source_data, source_full_name):
+    """Returns the number of entities in a source collection (0 if it is missing)."""
+    if source_full_name and source_full_name in source_data and isinstance(source_data[source_full_name], dict):
+        return len(source_data[source_full_name])
+    return 0
+
+
+def target_file_name(target_full_name):
+    """Returns the base output file name for a target entity type."""
+    if target_full_name == 'seaf.ta.components.network':
+        return 'network_devices'
+    if target_full_name == 'seaf.ta.services.network':
+        return 'networks'
+    # Default to the last part of the entity name for other types
+    return target_full_name.split('.')[-1]
+
+
+def convert_entity(entity_name, source_data, stream_entities=False):
+    """
+    Runs the converter of one entity over the source data.
+    Returns the converted data and the number of source entities it was converted from.
+    """
+    source_full_name = find_source_name(source_data, entity_name)
+    if stream_entities and entity_name in STREAM_CONVERTERS and source_full_name:
+        if isinstance(source_data, LazySourceData) and not source_data.is_loaded(source_full_name):
+            return stream_convert(STREAM_CONVERTERS[entity_name], source_data, source_full_name)
+        print(f"    [WARNING] {source_full_name} is already loaded, so {entity_name} cannot be streamed. Converting it from memory.")
+    converted_data = CONVERTERS[entity_name](source_data)
+    return converted_data, count_source_entities(source_data, source_full_name)
+
+
+def collect_entity_results(output, entity_name, converted_data):
+    """
+    Adds each target entity type of a converter result to the file it is saved in (see ConvertedOutput).
+    Returns the entity count per target type and the names of the files it goes to.
+    """
+    target_counts = {}
+    file_names = []
+    if converted_data and isinstance(converted_data, dict):
+        for target_full_name, entities in converted_data.items():
+            target_counts[target_full_name] = len(entities) if isinstance(entities, dict) else 0
+            base_file_name = target_file_name(target_full_name)
+            output.add(base_file_name, {target_full_name: entities}, origin=entity_name)
+            file_names.append(f"{base_file_name}.yaml")
+    return target_counts, file_names
+
+
+def parse_arguments():
+    """Parses the command line arguments."""
     parser = argparse.ArgumentParser(description='Convert cloud architecture data to SEAF-core format.')
-    parser.add_argument('--input-dir', type=str, help='Input directory with source files.')
-    parser.add_argument('--output-dir', type=str, help='Output directory for converted files.')
+    parser.add_argument('--input-dir', '--input', dest='input_dir', type=str, action='append', help="Input directory (or archive) with source files, or '-' to read source documents from stdin. Can be given several times.")
+    parser.add_argument('--recursive', action='store_true', help='Also load source files from sub-directories of the input directories.')
+    parser.add_argument('--output-dir', '--output', dest='output_dir', type=str, help="Output directory for converted files, or '-' to write them to stdout as one bundle.")
+    parser.add_argument('--stdout-format', choices=STREAM_FORMATS, default='yaml', help="Format of the bundle written with '--output -': a multi-document YAML stream (default) or a tar stream.")
     parser.add_argument('--id-prefix', type=str, help='Identifier prefix to use for generated entity IDs (overrides config and auto detection).')
     parser.add_argument('--config', type=str, default='converter_config.yaml', help='Path to the configuration file.')
+    parser.add_argument('--yaml-backend', choices=LOADER_BACKENDS, help="YAML loader backend for source files: 'libyaml' (C), 'python' or 'auto' (default, LibYAML when available).")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, help="Format of converted files: 'yaml' (default), 'json', 'jsonl' (one entity per line) or 'bundle' (all targets in one indexed file).")
+    parser.add_argument('--compress', choices=OUTPUT_COMPRESSIONS, help="Compress converted files while writing them (server.yaml.gz, server.yaml.xz). root.yaml stays uncompressed.")
+    parser.add_argument('--partition-by', choices=PARTITION_KEYS, help="Write converted entities into a sub-directory per DC, tenant or availability zone, each with its own root.yaml; the rest goes to '_shared'.")
+    parser.add_argument('--max-entities-per-file', type=int, help='Split target files with more entities than this into numbered shards (e.g. server.0001.yaml).')
+    parser.add_argument('--table-format', choices=TABLE_FORMATS, help='Also export servers (with a child table of their disks) and networks as flat tables in this format to the output directory.')
+    parser.add_argument('--sink', type=str, help="Also upsert every converted entity into a database, e.g. 'sqlite:estate.db' (one row per entity with indexed location, segment, az and external_id columns).")
+    parser.add_argument('--yaml-dumper', choices=DUMPER_BACKENDS, help="YAML dumper backend for converted files: 'libyaml' (C), 'python' or 'auto' (default, LibYAML when available). The output is the same with both.")
+    parser.add_argument('--write-jobs', type=int, help='Number of worker processes used to serialize and write converted files (default: 1, 0 = all CPUs).')
+    parser.add_argument('--load-jobs', type=int, help='Number of worker processes used to parse source files (default: 1, 0 = all CPUs).')
+    parser.add_argument('--source-cache-dir', type=str, help='Directory of the parsed source cache (default: ~/.cache/adv_reverse2seaf/source).')
+    parser.add_argument('--no-source-cache', action='store_true', help='Parse every source file and do not read or update the parsed source cache.')
+    parser.add_argument('--lazy-load', action='store_true', help='Index source files up front and parse each one only when a converter reads its collection.')
+    parser.add_argument('--stream', action='store_true', help='Stream large source collections (ecss) entity by entity into their converter instead of loading them. Implies --lazy-load.')
+    parser.add_argument('--tenant', type=str, action='append', help='Only convert entities of this tenant (and the entities they reference). Can be given several times.')
+    parser.add_argument('--dc', type=str, action='append', help='Only convert entities of this DC (a DC reference or AZ name). Can be given several times.')
+    parser.add_argument('--az', type=str, action='append', help='Only convert entities of this availability zone. Can be given several times.')
+    parser.add_argument('--sample', type=int, help='Convert a reproducible sample of N entities per source collection (plus the entities they reference).')
+    parser.add_argument('--sample-fraction', type=float, help='Like --sample, but pick this fraction (0-1] of each source collection.')
+    parser.add_argument('--sample-seed', type=int, help='Random seed of --sample / --sample-fraction (default: 0).')
+    parser.add_argument('--pipeline', action='store_true', help='Overlap loading, conversion and writing: converters start as soon as their source collections are loaded and results are written in the background.')
+    parser.add_argument('--pipeline-queue-size', type=int, help=f'Capacity of the queues between the pipeline stages (default: {DEFAULT_QUEUE_SIZE}).')
     parser.add_argument('entities', nargs='*', help='Specific entities to convert (e.g., vpcs subnets). Overrides config file.')
 
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+def main():
+    """Main function to run the conversion process."""
+
+    # 1. Argument Parsing
+    args = parse_arguments()
+    if is_stdout(args.output_dir or ''):
+        # Standard output carries the converted bundle, so progress messages go to stderr
+        output_stream = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            run(args, output_stream)
+    else:
+        run(args)
+
+
+def run(args, output_stream=None):
+    """Runs the conversion for parsed arguments. If output_stream is given, the converted files are written to it as one bundle."""
 
     # 2. Load Configuration
     config_path = Path(script_dir) / args.config  # Resolve config path relative to script_dir
@@ -93,9 +276,81 @@ def main():
 
     # 3. Merge CLI arguments with config file (CLI overrides config)
     base_dir = Path.cwd()
-    input_dir = Path(args.input_dir or config.get('input_dir') or base_dir)
+    input_dirs = args.input_dir or config.get('input_dir') or base_dir
+    input_dirs = [Path(path) for path in (input_dirs if isinstance(input_dirs, list) else [input_dirs])]
+    recursive = args.recursive or bool(config.get('recursive'))
     output_dir = Path(args.output_dir or config.get('output_dir') or base_dir)
     id_prefix_override = args.id_prefix or config.get('id_prefix')
+    yaml_backend = args.yaml_backend or config.get('yaml_backend') or 'auto'
+    yaml_dumper = args.yaml_dumper or config.get('yaml_dumper') or 'auto'
+    load_jobs = args.load_jobs if args.load_jobs is not None else config.get('load_jobs', 1)
+    write_jobs = args.write_jobs if args.write_jobs is not None else config.get('write_jobs', 1)
+    max_entities_per_file = args.max_entities_per_file or config.get('max_entities_per_file')
+    output_format = args.output_format or config.get('output_format') or 'yaml'
+    compression = args.compress or config.get('compress')
+    sink = args.sink or config.get('sink')
+    table_format = args.table_format or config.get('table_format')
+    partition_by = args.partition_by or config.get('partition_by')
+    stream_entities = args.stream or bool(config.get('stream'))
+    lazy_load = args.lazy_load or stream_entities or bool(config.get('lazy_load'))
+    entity_filter = EntityFilter(
+        tenants=args.tenant or config.get('tenant'),
+        dcs=args.dc or config.get('dc'),
+        azs=args.az or config.get('az')
+    )
+    sample_size = args.sample if args.sample is not None else config.get('sample')
+    sample_fraction = args.sample_fraction if args.sample_fraction is not None else config.get('sample_fraction')
+    sample_seed = args.sample_seed if args.sample_seed is not None else config.get('sample_seed', 0)
+    try:
+        sample = SourceSample(
+            count=sample_size, fraction=None if sample_size is not None else sample_fraction, seed=sample_seed
+        )
+        # Resolved once, so an unknown backend or a missing LibYAML is reported before converting
+        yaml_dumper = resolve_dumper(yaml_dumper)[0]
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'. Expected one of: {', '.join(OUTPUT_FORMATS)}")
+        if compression and compression not in OUTPUT_COMPRESSIONS:
+            raise ValueError(f"Unknown output compression '{compression}'. Expected one of: {', '.join(OUTPUT_COMPRESSIONS)}")
+        sink = parse_sink(sink) if sink else None
+        if partition_by and partition_by not in PARTITION_KEYS:
+            raise ValueError(f"Unknown partition key '{partition_by}'. Expected one of: {', '.join(PARTITION_KEYS)}")
+        if table_format and table_format not in TABLE_FORMATS:
+            raise ValueError(f"Unknown table format '{table_format}'. Expected one of: {', '.join(TABLE_FORMATS)}")
+        if max_entities_per_file is not None and max_entities_per_file < 1:
+            raise ValueError(f"--max-entities-per-file must be at least 1, got {max_entities_per_file}")
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    if output_stream is not None and output_format != 'yaml':
+        print(f"[WARNING] Output format '{output_format}' only applies to output directories. Writing YAML to stdout.")
+        output_format = 'yaml'
+    if output_stream is not None and compression:
+        print("[WARNING] --compress only applies to output directories. Writing uncompressed output to stdout.")
+        compression = None
+    if partition_by and (output_stream is not None or output_format == 'bundle'):
+        print("[WARNING] --partition-by only applies to files in output directories. Output is not partitioned.")
+        partition_by = None
+    if output_stream is not None and table_format:
+        print("[WARNING] --table-format only applies to output directories. Tables are not exported.")
+        table_format = None
+    pipeline = args.pipeline or bool(config.get('pipeline'))
+    pipeline_queue_size = args.pipeline_queue_size or config.get('pipeline_queue_size') or DEFAULT_QUEUE_SIZE
+    if pipeline and (entity_filter or sample):
+        print("[WARNING] Entity filters and sampling need all source collections. Pipeline mode is disabled.")
+        pipeline = False
+    if pipeline and partition_by == 'tenant':
+        print("[WARNING] Tenant partitioning needs all source collections. Pipeline mode is disabled.")
+        pipeline = False
+    source_cache = None
+    if not (args.no_source_cache or config.get('source_cache') is False):
+        source_cache_max_mb = config.get('source_cache_max_mb')
+        try:
+            source_cache = SourceCache(
+                args.source_cache_dir or config.get('source_cache_dir'),
+                max_bytes=source_cache_max_mb * 1024 * 1024 if source_cache_max_mb else DEFAULT_MAX_BYTES
+            )
+        except OSError as e:
+            print(f"[WARNING] Cannot use the source cache: {e}. Continuing without it.")
     
     # CLI entities list overrides config if provided
     if args.entities:
@@ -103,115 +358,442 @@ def main():
     else:
         entities_to_convert = config.get('entities_to_convert', ['__all__'])
 
-    # Create output directory if it doesn't exist
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    # Converter results are merged per target file in memory and every file is written once
+    output = ConvertedOutput()
+    file_writer = None
+    if output_stream is None:
+        # Create output directory if it doesn't exist
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        if write_jobs != 1 and output_format != 'bundle':
+            file_writer = ConvertedFileWriter(
+                output_dir, dumper=yaml_dumper, jobs=write_jobs, output_format=output_format, compression=compression
+            )
 
     print("--- Conversion Started ---\n")
-    print(f"Input directory: {input_dir}")
+    print(f"Input directory: {', '.join(str(path) for path in input_dirs)}{' (recursive)' if recursive else ''}")
     print(f"Output directory: {output_dir}")
+    print(f"Output format: {output_format}{f' ({compression})' if compression else ''}")
+    if table_format:
+        print(f"Table export: {table_format}")
+    if sink:
+        print(f"Sink: {':'.join(sink)}")
+    if partition_by:
+        print(f"Partition by: {partition_by}")
+    if max_entities_per_file:
+        print(f"Max entities per file: {max_entities_per_file} (larger files are split into shards)")
     print(f"Entities to convert: {', '.join(entities_to_convert)}")
+    print(f"YAML dumper: {yaml_dumper}{f', write jobs: {file_writer.jobs}' if file_writer else ''}")
+    if entity_filter:
+        print(f"Entity filter: {entity_filter.describe()}")
+    if sample:
+        print(f"Sample: {sample.describe()}")
     print("--------------------------")
 
-    # 4. Load source data
-    print("\nLoading source files...")
-    source_data = load_source_data(input_dir)
-    determine_prefix(source_data, id_prefix_override)
-    if not source_data:
-        print("[ERROR] No source data loaded. Aborting.")
-        return
-    print("Source files loaded.")
-
     # --- Analytical Summary Tracking ---
     conversion_results = []
     skipped_entities = []
     failed_conversions = []
     converted_files = []
+    # Saved files whose content changed and files that were already up to date
+    written_files = set()
+    unchanged_files = set()
+    # Digests and contents (target keys, entity count) of the saved files as stored, for the manifest
+    file_digests = {}
+    file_contents = {}
 
     if '__all__' in entities_to_convert:
         entities_to_convert = list(CONVERTERS.keys())
+    if stream_entities and not pipeline:
+        # Streaming converters run first, before other converters load the collections they stream
+        entities_to_convert = sorted(entities_to_convert, key=lambda entity_name: entity_name not in STREAM_CONVERTERS)
+        for entity_name in entities_to_convert:
+            if entity_name not in STREAM_CONVERTERS:
+                continue
+            # Converters reading the streamed collection still parse its source file in full
+            readers = [
+                name for name in entities_to_convert
+                if name != entity_name and name in CONVERTERS and entity_name in CONVERTER_SOURCES.get(name, ())
+            ]
+            if readers:
+                print(f"[WARNING] {', '.join(readers)} also read {entity_name}, so it is parsed in full after streaming. "
+                      f"Convert {entity_name} alone to keep only one of its entities in memory.")
 
-    # Create a mapping from short entity name to full source name
-    source_name_map = {}
-    for key in source_data.keys():
-        short_name = key.split('.')[-1]
-        source_name_map[short_name] = key
-
-    # 5. Call converters
-    print("\nStarting entity conversion...")
-    for entity_name in entities_to_convert:
-        if entity_name in CONVERTERS:
-            source_full_name = source_name_map.get(entity_name)
-            try:
-                print(f"  - Converting {entity_name}...")
-                convert_function = CONVERTERS[entity_name]
-                converted_data = convert_function(source_data)
-
-                # Determine source count
-                source_count = 0
-                if source_full_name and source_full_name in source_data and isinstance(source_data[source_full_name], dict):
-                    source_count = len(source_data[source_full_name])
-
-                # Process and save converted data, and collect target counts
-                target_counts = {}
-                if converted_data and isinstance(converted_data, dict):
-                    for target_full_name, entities in converted_data.items():
-                        count = len(entities) if isinstance(entities, dict) else 0
-                        target_counts[target_full_name] = count
-                        
-                        # Save each target entity to its own file
-                        # Determine the file name based on the target entity type
-                        if target_full_name == 'seaf.ta.components.network':
-                            base_file_name = 'network_devices'
-                        elif target_full_name == 'seaf.ta.services.network':
-                            base_file_name = 'networks'
-                        else:
-                            # Default to the last part of the entity name for other types
-                            base_file_name = target_full_name.split('.')[-1]
-                        
-                        file_name = f"{base_file_name}.yaml"
-                        save_converted_data(output_dir, base_file_name, {target_full_name: entities})
-                        converted_files.append(file_name)
-                
-                # Store results for summary
-                conversion_results.append({
-                    'source_name': source_full_name or entity_name,
-                    'source_count': source_count,
-                    'target_counts': target_counts,
-                    'status': 'SUCCESS'
-                })
+    def record_success(entity_name, source_full_name, source_count, converted_data):
+        """
+        Collects the converted data of one entity for saving and stores the results for the summary.
+        Returns the names of the files the data goes to.
+        """
+        target_counts, file_names = collect_entity_results(output, entity_name, converted_data)
+        conversion_results.append({
+            'source_name': source_full_name or entity_name,
+            'source_count': source_count,
+            'target_counts': target_counts,
+            'status': 'SUCCESS'
+        })
+        return file_names
+
+    # Assigns entities to partition sub-directories with --partition-by (set up once the source data is loaded)
+    partitioner = None
+
+    def output_parts(file_name):
+        """
+        Returns the (relative file name, relative shard name, data, merge) tuples an accumulated
+        target file is written as: one per partition with --partition-by ('<partition>/<file>'), each
+        split into shards if it holds more than max_entities_per_file entities (the shard name is the
+        file name otherwise). Shards replace their files instead of being merged into them, as their
+        boundaries move when the collection changes.
+        """
+        parts = partitioner.split(output.files[file_name]) if partitioner else [(None, output.files[file_name])]
+        tuples = []
+        for partition, data in parts:
+            part_name = file_name if partition is None else f"{partition}/{file_name}"
+            shards = split_into_shards(part_name, data, max_entities_per_file)
+            for shard_name, shard_data in shards:
+                tuples.append((part_name, shard_name, shard_data, len(shards) == 1))
+        return tuples
 
+    def save_output_file(file_name):
+        """
+        Writes one accumulated target file, merging it once with an existing file of the same name,
+        or its partitions and shards (see output_parts()).
+        """
+        if output_format == 'bundle':
+            # All files go to the bundle at the end
+            return
+        for _, shard_name, shard_data, merge in output_parts(file_name):
+            entity_file_name = os.path.splitext(shard_name)[0]
+            shard_name = output_file_name(shard_name, output_format, compression)
+            if file_writer is not None:
+                # Written in a worker process; the result is reported by finish_writes()
+                file_writer.submit(shard_name, shard_data, merge)
+                continue
+            try:
+                file_path, digest, changed, contents = write_converted_data(
+                    output_dir, entity_file_name, shard_data, yaml_dumper, merge, output_format, compression
+                )
+                report_saved_file(entity_file_name, file_path, changed)
+                record_saved_file(shard_name, changed, digest, contents)
             except Exception as e:
-                print(f"    [ERROR] Failed to convert {entity_name}: {e}")
-                failed_conversions.append({'entity': entity_name, 'reason': str(e)})
-                # Find source count even if conversion fails
-                source_count = 0
-                if source_full_name and source_full_name in source_data and isinstance(source_data[source_full_name], dict):
-                    source_count = len(source_data[source_full_name])
-                conversion_results.append({
-                    'source_name': source_full_name or entity_name,
-                    'source_count': source_count,
-                    'target_counts': {},
-                    'status': 'FAILED'
-                })
+                print(f"    [ERROR] Failed to save {shard_name}: {e}")
+
+    def save_output_bundle():
+        """Writes all accumulated target files (or their shards) into the bundle file."""
+        files = [
+            shard for file_name in sorted(output.files)
+            for shard in split_into_shards(file_name, output.files[file_name], max_entities_per_file)
+        ]
+        try:
+            bundle_path, digest, changed = save_bundle(output_dir, files, compression)
+        except Exception as e:
+            print(f"    [ERROR] Failed to save {BUNDLE_FILE_NAME}: {e}")
+            return
+        file_digests[os.path.basename(bundle_path)] = digest
+        if changed:
+            written_files.add(os.path.basename(bundle_path))
+            print(f"  [SUCCESS] Saved {len(files)} converted files to {bundle_path}")
         else:
-            print(f"    [WARNING] No converter found for entity '{entity_name}'. Skipping.")
-            skipped_entities.append(entity_name)
+            unchanged_files.add(os.path.basename(bundle_path))
+            print(f"  [UNCHANGED] Bundle {bundle_path} is up to date")
+
+    def record_saved_file(file_name, changed, digest, contents):
+        converted_files.append(file_name)
+        file_digests[file_name] = digest
+        file_contents[file_name] = contents
+        # A file written more than once counts as written if any of the writes changed it
+        if changed:
+            written_files.add(file_name)
+            unchanged_files.discard(file_name)
+        elif file_name not in written_files:
+            unchanged_files.add(file_name)
+
+    def finish_writes():
+        """Waits for the files written in worker processes. Returns False if any of them failed."""
+        if file_writer is None:
+            return True
+        written, unchanged, failed = file_writer.wait()
+        for file_name in written:
+            record_saved_file(file_name, True, file_writer.digests[file_name], file_writer.contents[file_name])
+        for file_name in unchanged:
+            record_saved_file(file_name, False, file_writer.digests[file_name], file_writer.contents[file_name])
+        return not failed
+
+    def remove_stale_output_files():
+        """
+        Deletes the shards, or unsharded files, that target files are no longer written as, e.g.
+        server.0004.yaml left by a run with more entities or a smaller --max-entities-per-file.
+        """
+        kept_names = {}
+        for file_name in sorted(output.files):
+            for part_name, shard_name, _, _ in output_parts(file_name):
+                kept_names.setdefault(output_file_name(part_name, output_format, compression), set()).add(
+                    output_file_name(shard_name, output_format, compression)
+                )
+        for part_name, names in kept_names.items():
+            try:
+                removed = remove_stale_shards(output_dir, part_name, names)
+            except OSError as e:
+                print(f"    [ERROR] Failed to remove stale shards of {part_name}: {e}")
+                continue
+            for removed_name in removed:
+                print(f"    [SUCCESS] Removed stale {os.path.join(output_dir, removed_name)}")
+                # A file written earlier in this run (e.g. by --pipeline) is no longer imported
+                while removed_name in converted_files:
+                    converted_files.remove(removed_name)
+                written_files.discard(removed_name)
+                unchanged_files.discard(removed_name)
+
+    def save_output_manifest():
+        """Writes manifest.json describing every saved output file (or the bundle) and the source files."""
+        sources = fingerprint_sources(file_paths, source_cache)
+        entries = {}
+        if output_format == 'bundle':
+            bundle_name = BUNDLE_FILE_NAME + OUTPUT_COMPRESSIONS.get(compression, '')
+            if bundle_name in written_files | unchanged_files:
+                bundle_data = {}
+                converters = []
+                for file_name in sorted(output.files):
+                    bundle_data.update(output.files[file_name])
+                    converters.extend(name for name in output.contributors[file_name] if name not in converters)
+                # The bundle is written from this run's data only, without merging
+                entries[bundle_name] = manifest_entry(
+                    file_digests[bundle_name], describe_contents(bundle_data), converters, CONVERTER_SOURCES, sources
+                )
+        else:
+            saved_files = set(converted_files)
+            for file_name in sorted(output.files):
+                for _, shard_name, _, _ in output_parts(file_name):
+                    shard_name = output_file_name(shard_name, output_format, compression)
+                    if shard_name in saved_files:
+                        entries[shard_name] = manifest_entry(
+                            file_digests[shard_name], file_contents[shard_name], output.contributors[file_name],
+                            CONVERTER_SOURCES, sources
+                        )
+        try:
+            manifest_path, changed = save_manifest(output_dir, entries, sources)
+        except Exception as e:
+            print(f"  [ERROR] Failed to save {MANIFEST_FILE_NAME}: {e}")
+            return
+        if changed:
+            written_files.add(MANIFEST_FILE_NAME)
+            print(f"  [SUCCESS] Saved manifest of {len(entries)} files to {manifest_path}")
+        else:
+            unchanged_files.add(MANIFEST_FILE_NAME)
+            print(f"  [UNCHANGED] {MANIFEST_FILE_NAME} is up to date at {manifest_path}")
+
+    def record_failure(entity_name, source_full_name, source_count, error):
+        print(f"    [ERROR] Failed to convert {entity_name}: {error}")
+        failed_conversions.append({'entity': entity_name, 'reason': str(error)})
+        conversion_results.append({
+            'source_name': source_full_name or entity_name,
+            'source_count': source_count,
+            'target_counts': {},
+            'status': 'FAILED'
+        })
+
+    file_paths = list_input_sources(input_dirs, recursive)
+    # The write pool is also stopped when loading fails or is aborted
+    try:
+        if pipeline:
+            # 4-5. Load, convert and save in overlapping stages
+            if lazy_load:
+                print("[WARNING] Pipeline mode loads source files itself. --lazy-load and --stream are ignored.")
+            if not file_paths:
+                print("[ERROR] No source data loaded. Aborting.")
+                return
+            for entity_name in entities_to_convert:
+                if entity_name not in CONVERTERS:
+                    print(f"    [WARNING] No converter found for entity '{entity_name}'. Skipping.")
+                    skipped_entities.append(entity_name)
+            tasks = [(entity_name, CONVERTER_SOURCES.get(entity_name, ())) for entity_name in entities_to_convert
+                     if entity_name in CONVERTERS]
+
+            def pipeline_convert(entity_name, source_data):
+                source_full_name = find_source_name(source_data, entity_name)
+                try:
+                    print(f"  - Converting {entity_name}...")
+                    converted_data, source_count = convert_entity(entity_name, source_data)
+                except Exception as e:
+                    record_failure(entity_name, source_full_name, count_source_entities(source_data, source_full_name), e)
+                    return None
+                return source_full_name, source_count, converted_data
+
+            # Target files still waiting for converters that write to them
+            pending_targets = {}
+            for entity_name, _ in tasks:
+                for target_full_name in CONVERTER_TARGETS.get(entity_name, ()):
+                    pending_targets.setdefault(f"{target_file_name(target_full_name)}.yaml", set()).add(entity_name)
+            scheduled_files = set()
+            changed_files = set()
+
+            def pipeline_collect(entity_name, result):
+                if result is not None:
+                    source_full_name, source_count, converted_data = result
+                    try:
+                        changed_files.update(record_success(entity_name, source_full_name, source_count, converted_data))
+                    except Exception as e:
+                        record_failure(entity_name, source_full_name, source_count, e)
+                for contributors in pending_targets.values():
+                    contributors.discard(entity_name)
+                if output_stream is not None:
+                    return []
+                finished = sorted(
+                    file_name for file_name in changed_files
+                    if file_name in pending_targets and not pending_targets[file_name] and file_name not in scheduled_files
+                )
+                scheduled_files.update(finished)
+                changed_files.difference_update(finished)
+                return [functools.partial(save_output_file, file_name) for file_name in finished]
+
+            def pipeline_finish():
+                # Files of undeclared targets, or that got data after they were written
+                if output_stream is not None:
+                    return []
+                return [functools.partial(save_output_file, file_name) for file_name in sorted(changed_files)]
+
+            if partition_by:
+                # Only DC and AZ partitions, which are read from the converted entities themselves
+                partitioner = OutputPartitioner(partition_by)
+            print(f"\nRunning pipeline: {len(file_paths)} source files, YAML loader backend: {resolve_loader(yaml_backend)[0]}, "
+                  f"load jobs: {load_jobs}, queue size: {pipeline_queue_size}")
+            source_data = run_pipeline(
+                file_paths, tasks, pipeline_convert, pipeline_collect, pipeline_finish, backend=yaml_backend, jobs=load_jobs,
+                cache=source_cache, id_prefix=id_prefix_override, queue_size=pipeline_queue_size
+            )
+        else:
+            # 4. Load source data
+            print("\nLoading source files...")
+            source_data = load_source_data(
+                file_paths, backend=yaml_backend, jobs=load_jobs, cache=source_cache, lazy=lazy_load, recursive=recursive,
+                entity_filter=entity_filter, sample=sample
+            )
+            determine_prefix(source_data, id_prefix_override)
+            if not source_data:
+                print("[ERROR] No source data loaded. Aborting.")
+                return
+            if partition_by:
+                partitioner = OutputPartitioner(partition_by, source_data)
+            print("Source files loaded.")
+
+            # 5. Call converters
+            print("\nStarting entity conversion...")
+            for entity_name in entities_to_convert:
+                if entity_name in CONVERTERS:
+                    source_full_name = find_source_name(source_data, entity_name)
+                    try:
+                        print(f"  - Converting {entity_name}...")
+                        converted_data, source_count = convert_entity(entity_name, source_data, stream_entities)
+                        record_success(entity_name, source_full_name, source_count, converted_data)
+                    except Exception as e:
+                        record_failure(entity_name, source_full_name, count_source_entities(source_data, source_full_name), e)
+                else:
+                    print(f"    [WARNING] No converter found for entity '{entity_name}'. Skipping.")
+                    skipped_entities.append(entity_name)
+
+            # Each target file is written once, with the results of all converters merged
+            if output_stream is None and output.files and output_format != 'bundle':
+                print("\nSaving converted files...")
+                for file_name in sorted(output.files):
+                    save_output_file(file_name)
+
+        writes_succeeded = finish_writes()
+    finally:
+        if file_writer is not None:
+            file_writer.close()
+    if output_stream is None and output_format != 'bundle':
+        remove_stale_output_files()
+
+    if output.conflicts:
+        print(f"\n[WARNING] {output.conflicts} conflicting entity IDs were produced by different converters.")
 
     # 6. Generate root.yaml
-    if converted_files:
+    root_imports = root_importable_files(converted_files)
+    if output_stream is not None:
+        print(f"\nWriting {len(output.files)} converted files and root.yaml to stdout ({args.stdout_format})...")
+        if args.stdout_format == 'tar':
+            write_tar_stream(output_stream.buffer, output.rendered_files(yaml_dumper, max_entities_per_file))
+        else:
+            write_yaml_bundle(output_stream, output.rendered_files(yaml_dumper, max_entities_per_file))
+    elif not writes_succeeded:
+        print("\n[ERROR] Some converted files could not be written, skipping root.yaml generation.")
+    elif output_format == 'bundle':
+        # The bundle index takes the place of root.yaml
+        if output.files:
+            print("\nSaving converted bundle...")
+            save_output_bundle()
+        else:
+            print("\nNo files converted, skipping bundle generation.")
+    elif converted_files and not root_imports:
+        print(f"\n[WARNING] SEAF root imports cannot load {output_format} files{f' compressed with {compression}' if compression else ''}: "
+              "only uncompressed YAML and JSON files can be imported. Skipping root.yaml generation.")
+    elif converted_files:
+        if len(root_imports) < len(converted_files):
+            skipped_imports = sorted(set(converted_files) - set(root_imports))
+            print(f"\n[WARNING] SEAF root imports cannot load {', '.join(skipped_imports)}. They are left out of root.yaml.")
+        if partitioner:
+            print("\nGenerating partition root.yaml files...")
+            for partition, imports in partition_imports(root_imports).items():
+                partition_root = f"{partition}/root.yaml"
+                try:
+                    root_yaml_path, changed = save_root_yaml(os.path.join(output_dir, partition), imports)
+                except Exception as e:
+                    print(f"  [ERROR] Failed to save {partition_root}: {e}")
+                    continue
+                if changed:
+                    written_files.add(partition_root)
+                    print(f"  [SUCCESS] Generated {partition_root} at {root_yaml_path}")
+                else:
+                    unchanged_files.add(partition_root)
+                    print(f"  [UNCHANGED] {partition_root} is up to date at {root_yaml_path}")
         print("\nGenerating root.yaml...")
-        root_yaml_content = {'imports': sorted(list(set(converted_files)))} # Use set to remove duplicates and sort
-        root_yaml_path = os.path.join(output_dir, 'root.yaml')
-        with open(root_yaml_path, 'w') as f:
-            yaml.dump(root_yaml_content, f, allow_unicode=True, sort_keys=False)
-        print(f"  [SUCCESS] Generated root.yaml at {root_yaml_path}")
+        root_yaml_path, changed = save_root_yaml(output_dir, root_imports)
+        if changed:
+            written_files.add('root.yaml')
+            print(f"  [SUCCESS] Generated root.yaml at {root_yaml_path}")
+        else:
+            unchanged_files.add('root.yaml')
+            print(f"  [UNCHANGED] root.yaml is up to date at {root_yaml_path}")
     else:
         print("\nNo files converted, skipping root.yaml generation.")
 
+    # 7. Export flat tables for spreadsheets
+    if table_format and output.files:
+        print(f"\nExporting tables ({table_format})...")
+        try:
+            for table_name, row_count, changed in save_tables(output_dir, output.files, table_format):
+                if changed:
+                    written_files.add(table_name)
+                    print(f"  [SUCCESS] Exported {row_count} rows to {os.path.join(output_dir, table_name)}")
+                else:
+                    unchanged_files.add(table_name)
+                    print(f"  [UNCHANGED] {table_name} is up to date in {output_dir}")
+        except Exception as e:
+            print(f"  [ERROR] Failed to export tables: {e}")
+
+    # 8. Describe the output files for consumers that only import what changed
+    if output_stream is None and writes_succeeded and output.files:
+        print(f"\nWriting {MANIFEST_FILE_NAME}...")
+        save_output_manifest()
+
+    # 9. Load the converted entities into the sink for ad-hoc queries
+    if sink and output.files:
+        sink_scheme, sink_path = sink
+        print(f"\nUpserting converted entities into {sink_scheme}:{sink_path}...")
+        try:
+            entity_count = write_sqlite_sink(sink_path, output.files)
+            print(f"  [SUCCESS] Upserted {entity_count} entities into {sink_path}")
+        except Exception as e:
+            print(f"  [ERROR] Failed to write the {sink_scheme} sink {sink_path}: {e}")
+
+    if isinstance(source_data, LazySourceData):
+        print(f"\nLazy loading parsed {source_data.parsed_file_count} of {source_data.file_count} source files.")
+
     print("\n--- Conversion Finished ---\n")
 
     # --- Analytical Summary ---
-    generate_summary(conversion_results, skipped_entities, failed_conversions)
+    output_counts = None
+    if output_stream is None:
+        output_counts = {'written': len(written_files), 'unchanged': len(unchanged_files)}
+    generate_summary(conversion_results, skipped_entities, failed_conversions, output_counts)
 
 
 if __name__ == '__main__':
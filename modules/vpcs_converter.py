@@ -1,6 +1,7 @@
 import ipaddress
 
 from id_prefix import ensure_prefix, dc_ref
+from manual_fill import ManualFill, MANUAL_ZONE_PLACEHOLDER
 
 # modules/vpcs_converter.py
 
@@ -146,7 +147,7 @@ def convert(source_data):
             'external_id': vpc_uuid,
             'sber': {
                 'location': location_refs[0] if location_refs else vpc_details.get('DC', ''),
-                'zone': '###PLACEHOLDER_FOR_MANUAL_ZONE###'
+                'zone': ManualFill(MANUAL_ZONE_PLACEHOLDER)
             }
         }
 
@@ -7,7 +7,7 @@ sys.path.append(os.path.abspath('_metamodel_/iaas/converter/modules'))
 sys.path.append(os.path.abspath('_metamodel_/iaas/converter/utils'))
 
 from id_prefix import set_prefix
-from ecss_converter import convert
+from ecss_converter import convert, convert_entities
 
 set_prefix('tenant')
 
@@ -253,5 +253,9 @@ class TestEcssConverter(unittest.TestCase):
         # Assert that the result is as expected
         self.assertEqual(converted_data, expected_output)
 
+        # The streaming entry point produces the same result from an iterator of entities
+        entities = iter(source_data['seaf.ta.reverse.cloud_ru.advanced.ecss'].items())
+        self.assertEqual(convert_entities(entities), expected_output)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,309 @@
+import unittest
+import sys
+import os
+import gzip
+import io
+import json
+import lzma
+import tarfile
+import zipfile
+import tempfile
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+import file_io
+from file_io import (
+    load_source_data, resolve_loader, detect_source_format, save_converted_data, save_root_yaml, ConvertedFileWriter
+)
+from source_merge import merge_source_data
+
+SOURCE_FILES = {
+    'ecss.yaml': """seaf.ta.reverse.cloud_ru.advanced.ecss:
+  tenant.ecss.e5e60a69-0653-4297-8799-ea0df4f0cacc:
+    id: e5e60a69-0653-4297-8799-ea0df4f0cacc
+    name: ecs-prod-someserver1
+    description: "Сервер приложений"
+    az: ru-moscow-1a
+    cpu:
+      cores: 2
+      frequency: '2500'
+    ram: 4096
+    created: 2024-03-01
+    subnets:
+      - 0d9f37b6-0889-4763-8cf3-20d9641af0c1
+    disks:
+      - disk-uuid-1:
+          device: /dev/vda
+          size: 50
+          encrypted: false
+""",
+    'subnets.yml': """seaf.ta.reverse.cloud_ru.advanced.subnets:
+  tenant.subnets.0d9f37b6-0889-4763-8cf3-20d9641af0c1:
+    id: 0d9f37b6-0889-4763-8cf3-20d9641af0c1
+    name: subnet-Prod
+    cidr: 10.10.0.0/24
+    dns_list: [100.125.13.59, 8.8.8.8]
+    gateway: null
+""",
+    'notes.txt': "not a source file\n",
+}
+
+
+class TestFileIo(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for filename, content in SOURCE_FILES.items():
+            with open(os.path.join(self.tmp_dir.name, filename), 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_python_backend_loads_all_yaml_files(self):
+        source_data = load_source_data(self.tmp_dir.name, backend='python')
+        self.assertEqual(sorted(source_data.keys()), [
+            'seaf.ta.reverse.cloud_ru.advanced.ecss',
+            'seaf.ta.reverse.cloud_ru.advanced.subnets',
+        ])
+        server = source_data['seaf.ta.reverse.cloud_ru.advanced.ecss']['tenant.ecss.e5e60a69-0653-4297-8799-ea0df4f0cacc']
+        self.assertEqual(server['description'], 'Сервер приложений')
+        self.assertEqual(server['cpu'], {'cores': 2, 'frequency': '2500'})
+
+    @unittest.skipUnless(file_io.CSafeLoader is not None, 'LibYAML is not available')
+    def test_libyaml_and_python_backends_match(self):
+        self.assertEqual(resolve_loader('libyaml')[0], 'libyaml')
+        self.assertEqual(
+            load_source_data(self.tmp_dir.name, backend='libyaml'),
+            load_source_data(self.tmp_dir.name, backend='python')
+        )
+
+    def test_libyaml_falls_back_to_python_when_unavailable(self):
+        with mock.patch.object(file_io, 'CSafeLoader', None):
+            self.assertEqual(resolve_loader('libyaml')[0], 'python')
+            self.assertEqual(resolve_loader('auto')[0], 'python')
+            source_data = load_source_data(self.tmp_dir.name, backend='auto')
+        self.assertEqual(source_data, load_source_data(self.tmp_dir.name, backend='python'))
+
+    def test_parallel_load_matches_serial_load(self):
+        serial = load_source_data(self.tmp_dir.name, jobs=1)
+        parallel = load_source_data(self.tmp_dir.name, jobs=2)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(list(parallel.keys()), list(serial.keys()))
+
+    def test_json_and_json_lines_sources_match_yaml(self):
+        expected = load_source_data(self.tmp_dir.name)
+        ecss = expected['seaf.ta.reverse.cloud_ru.advanced.ecss']
+        subnets = expected['seaf.ta.reverse.cloud_ru.advanced.subnets']
+        with tempfile.TemporaryDirectory() as json_dir:
+            with open(os.path.join(json_dir, 'subnets.json'), 'w', encoding='utf-8') as f:
+                json.dump({'seaf.ta.reverse.cloud_ru.advanced.subnets': subnets}, f, indent=2, ensure_ascii=False)
+            with open(os.path.join(json_dir, 'ecss.jsonl'), 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'__collection__': 'seaf.ta.reverse.cloud_ru.advanced.ecss'}) + '\n')
+                for entity_id, details in ecss.items():
+                    f.write(json.dumps({entity_id: details}, ensure_ascii=False, default=str) + '\n')
+            self.assertEqual(detect_source_format(os.path.join(json_dir, 'subnets.json')), 'json')
+            self.assertEqual(detect_source_format(os.path.join(json_dir, 'ecss.jsonl')), 'jsonl')
+
+            source_data = load_source_data(json_dir)
+            lazy_source_data = dict(load_source_data(json_dir, lazy=True))
+        self.assertEqual(source_data['seaf.ta.reverse.cloud_ru.advanced.subnets'], subnets)
+        server_id = 'tenant.ecss.e5e60a69-0653-4297-8799-ea0df4f0cacc'
+        self.assertEqual(source_data['seaf.ta.reverse.cloud_ru.advanced.ecss'][server_id]['disks'], ecss[server_id]['disks'])
+        self.assertEqual(lazy_source_data, source_data)
+
+    def test_format_is_detected_from_content(self):
+        with tempfile.TemporaryDirectory() as json_dir:
+            # JSON Lines content behind a .json extension, JSON content behind a .yaml extension
+            with open(os.path.join(json_dir, 'vpcs.json'), 'w', encoding='utf-8') as f:
+                f.write('{"__collection__": "seaf.ta.reverse.cloud_ru.advanced.vpcs"}\n{"tenant.vpcs.a": {"name": "vpc-a"}}\n')
+            with open(os.path.join(json_dir, 'eips.yaml'), 'w', encoding='utf-8') as f:
+                f.write('{"seaf.ta.reverse.cloud_ru.advanced.eips": {"tenant.eips.a": {"ext_address": "1.2.3.4"}}}\n')
+            self.assertEqual(detect_source_format(os.path.join(json_dir, 'vpcs.json')), 'jsonl')
+            self.assertEqual(detect_source_format(os.path.join(json_dir, 'eips.yaml')), 'json')
+            source_data = load_source_data(json_dir)
+        self.assertEqual(source_data, {
+            'seaf.ta.reverse.cloud_ru.advanced.eips': {'tenant.eips.a': {'ext_address': '1.2.3.4'}},
+            'seaf.ta.reverse.cloud_ru.advanced.vpcs': {'tenant.vpcs.a': {'name': 'vpc-a'}},
+        })
+
+    def test_compressed_files_and_archives_match_plain_files(self):
+        expected = load_source_data(self.tmp_dir.name)
+        yaml_files = [filename for filename in SOURCE_FILES if filename != 'notes.txt']
+        with tempfile.TemporaryDirectory() as packed_dir:
+            compressed_dir = os.path.join(packed_dir, 'compressed')
+            os.makedirs(compressed_dir)
+            for filename, compress in zip(yaml_files, (gzip.compress, lzma.compress)):
+                suffix = '.gz' if compress is gzip.compress else '.xz'
+                with open(os.path.join(compressed_dir, filename + suffix), 'wb') as f:
+                    f.write(compress(SOURCE_FILES[filename].encode('utf-8')))
+
+            tar_path = os.path.join(packed_dir, 'snapshot.tar.gz')
+            with tarfile.open(tar_path, 'w:gz') as archive:
+                for filename in SOURCE_FILES:
+                    archive.add(os.path.join(self.tmp_dir.name, filename), arcname=f"advanced/{filename}")
+            zip_path = os.path.join(packed_dir, 'snapshot.zip')
+            with zipfile.ZipFile(zip_path, 'w') as archive:
+                for filename in SOURCE_FILES:
+                    archive.write(os.path.join(self.tmp_dir.name, filename), arcname=f"advanced/{filename}")
+
+            for input_path in (compressed_dir, tar_path, zip_path):
+                with self.subTest(input_path=os.path.basename(input_path)):
+                    self.assertEqual(load_source_data(input_path), expected)
+                    self.assertEqual(dict(load_source_data(input_path, lazy=True)), expected)
+
+    def test_split_collections_are_merged_across_inputs(self):
+        with tempfile.TemporaryDirectory() as split_dir:
+            first_dir = os.path.join(split_dir, 'first', 'nested')
+            second_dir = os.path.join(split_dir, 'second')
+            os.makedirs(first_dir)
+            os.makedirs(second_dir)
+            with open(os.path.join(first_dir, 'ecss.yaml'), 'w', encoding='utf-8') as f:
+                f.write("seaf.ta.reverse.cloud_ru.advanced.ecss:\n  tenant.ecss.a: {name: a}\n  tenant.ecss.b: {name: b}\n")
+            with open(os.path.join(second_dir, 'ecss_part2.yaml'), 'w', encoding='utf-8') as f:
+                f.write("seaf.ta.reverse.cloud_ru.advanced.ecss:\n  tenant.ecss.b: {name: b2}\n  tenant.ecss.c: {name: c}\n")
+            inputs = [os.path.join(split_dir, 'first'), second_dir]
+
+            self.assertEqual(load_source_data(inputs), {'seaf.ta.reverse.cloud_ru.advanced.ecss': {
+                'tenant.ecss.b': {'name': 'b2'},
+                'tenant.ecss.c': {'name': 'c'},
+            }})
+            expected = {'seaf.ta.reverse.cloud_ru.advanced.ecss': {
+                'tenant.ecss.a': {'name': 'a'},
+                'tenant.ecss.b': {'name': 'b2'},
+                'tenant.ecss.c': {'name': 'c'},
+            }}
+            self.assertEqual(load_source_data(inputs, recursive=True), expected)
+            self.assertEqual(dict(load_source_data(inputs, recursive=True, lazy=True)), expected)
+
+    def test_merge_reports_duplicate_entity_ids(self):
+        duplicates = []
+        aggregated_data = {'seaf.ta.reverse.cloud_ru.advanced.vpcs': {'tenant.vpcs.a': {'name': 'a'}}, 'version': 1}
+        count = merge_source_data(
+            aggregated_data,
+            {'seaf.ta.reverse.cloud_ru.advanced.vpcs': {'tenant.vpcs.a': {'name': 'a2'}, 'tenant.vpcs.b': {}}, 'version': 2},
+            'vpcs_part2.yaml',
+            on_duplicate=lambda *args: duplicates.append(args)
+        )
+        self.assertEqual(count, 1)
+        self.assertEqual(duplicates, [('seaf.ta.reverse.cloud_ru.advanced.vpcs', 'tenant.vpcs.a', 'vpcs_part2.yaml')])
+        self.assertEqual(aggregated_data, {
+            'seaf.ta.reverse.cloud_ru.advanced.vpcs': {'tenant.vpcs.a': {'name': 'a2'}, 'tenant.vpcs.b': {}},
+            'version': 2,
+        })
+
+    def test_documents_are_read_from_stdin(self):
+        expected = load_source_data(self.tmp_dir.name)
+        yaml_stream = ''.join(
+            f"---\n{SOURCE_FILES[filename]}" for filename in ('ecss.yaml', 'subnets.yml')
+        ).encode('utf-8')
+        json_stream = '\n'.join(
+            json.dumps({key: value}, ensure_ascii=False, default=str) for key, value in expected.items()
+        ).encode('utf-8')
+        ecs_key = 'seaf.ta.reverse.cloud_ru.advanced.ecss'
+        records_stream = '\n'.join([
+            json.dumps({'__collection__': ecs_key}),
+            *(json.dumps({entity_id: details}, default=str) for entity_id, details in expected[ecs_key].items()),
+        ]).encode('utf-8')
+
+        with mock.patch.object(sys, 'stdin', io.TextIOWrapper(io.BytesIO(yaml_stream))):
+            self.assertEqual(load_source_data('-', lazy=True), expected)
+        # Dates become strings in JSON
+        expected[ecs_key]['tenant.ecss.e5e60a69-0653-4297-8799-ea0df4f0cacc']['created'] = '2024-03-01'
+        with mock.patch.object(sys, 'stdin', io.TextIOWrapper(io.BytesIO(json_stream))):
+            self.assertEqual(load_source_data(['-'], jobs=2), expected)
+        with mock.patch.object(sys, 'stdin', io.TextIOWrapper(io.BytesIO(records_stream))):
+            self.assertEqual(load_source_data('-'), {ecs_key: expected[ecs_key]})
+
+    def test_write_pool_matches_serial_writes(self):
+        network = 'seaf.ta.services.network'
+        writes = [
+            ('networks.yaml', {network: {'tenant.subnets.a': {'title': 'Подсеть A'}}}),
+            ('server.yaml', {'seaf.ta.components.server': {'tenant.ecss.a': {'title': 'Сервер'}}}),
+            ('networks.yaml', {network: {'tenant.subnets.b': {'title': 'Подсеть B'}}}),
+        ]
+        serial_dir = os.path.join(self.tmp_dir.name, 'serial')
+        pool_dir = os.path.join(self.tmp_dir.name, 'pool')
+        with mock.patch('builtins.print'):
+            for file_name, data in writes:
+                save_converted_data(serial_dir, os.path.splitext(file_name)[0], data)
+            writer = ConvertedFileWriter(pool_dir, jobs=2)
+            try:
+                for file_name, data in writes:
+                    writer.submit(file_name, data)
+                    # Data changed after submit() is not written
+                    data.clear()
+                written, unchanged, failed = writer.wait()
+            finally:
+                writer.close()
+        self.assertEqual(written, ['networks.yaml', 'server.yaml', 'networks.yaml'])
+        self.assertEqual(unchanged, [])
+        self.assertEqual(failed, [])
+        for file_name in ('networks.yaml', 'server.yaml'):
+            with open(os.path.join(serial_dir, file_name), encoding='utf-8') as serial, \
+                    open(os.path.join(pool_dir, file_name), encoding='utf-8') as pooled:
+                self.assertEqual(pooled.read(), serial.read())
+
+    def test_unchanged_files_are_not_rewritten(self):
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        data = {'seaf.ta.services.network': {'tenant.subnets.a': {'title': 'Подсеть A'}}}
+        file_path = os.path.join(output_dir, 'networks.yaml')
+        with mock.patch('builtins.print'):
+            self.assertTrue(save_converted_data(output_dir, 'networks', data))
+            self.assertEqual(save_root_yaml(output_dir, ['networks.yaml']), (os.path.join(output_dir, 'root.yaml'), True))
+            os.utime(file_path, (0, 0))
+            os.utime(os.path.join(output_dir, 'root.yaml'), (0, 0))
+            self.assertFalse(save_converted_data(output_dir, 'networks', data))
+            self.assertFalse(save_root_yaml(output_dir, ['networks.yaml'])[1])
+            self.assertEqual(os.path.getmtime(file_path), 0)
+            self.assertEqual(os.path.getmtime(os.path.join(output_dir, 'root.yaml')), 0)
+            self.assertTrue(save_converted_data(output_dir, 'networks', {'seaf.ta.services.network': {'tenant.subnets.b': {}}}))
+        self.assertNotEqual(os.path.getmtime(file_path), 0)
+        self.assertEqual(sorted(os.listdir(output_dir)), ['networks.yaml', 'root.yaml'])
+
+    def test_compressed_output_files(self):
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        data = {'seaf.ta.services.network': {'tenant.subnets.a': {'title': 'Подсеть A'}}}
+        with mock.patch('builtins.print'):
+            save_converted_data(output_dir, 'networks', data)
+            for compression, open_file in (('gzip', gzip.open), ('xz', lzma.open)):
+                with self.subTest(compression=compression):
+                    self.assertTrue(save_converted_data(output_dir, 'networks', data, compression=compression))
+                    file_path = os.path.join(output_dir, f"networks.yaml{file_io.OUTPUT_COMPRESSIONS[compression]}")
+                    with open_file(file_path, 'rt', encoding='utf-8') as compressed, \
+                            open(os.path.join(output_dir, 'networks.yaml'), encoding='utf-8') as plain:
+                        self.assertEqual(compressed.read(), plain.read())
+                    self.assertEqual(file_io.parse_source_file(file_path), (data, None))
+                    # Compressed output is reproducible, so a rerun leaves the file untouched
+                    os.utime(file_path, (0, 0))
+                    self.assertFalse(save_converted_data(output_dir, 'networks', data, compression=compression))
+                    self.assertEqual(os.path.getmtime(file_path), 0)
+
+    def test_stale_shards_are_removed(self):
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        os.makedirs(os.path.join(output_dir, 'ru-1a'))
+        existing = ['server.yaml', 'server.0001.yaml', 'server.0002.yaml', 'server.0003.yaml', 'server.0001.json.gz',
+                    'server_group.0001.yaml', 'networks.yaml', 'ru-1a/server.0001.yaml']
+        for file_name in existing:
+            with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+                f.write('{}\n')
+        # Shards with higher indices and the unsharded file go; other formats and targets stay
+        self.assertEqual(
+            file_io.remove_stale_shards(output_dir, 'server.yaml', {'server.0001.yaml', 'server.0002.yaml'}),
+            ['server.0003.yaml', 'server.yaml']
+        )
+        self.assertEqual(file_io.remove_stale_shards(output_dir, 'ru-1a/server.yaml', {'ru-1a/server.yaml'}),
+                         ['ru-1a/server.0001.yaml'])
+        self.assertEqual(file_io.remove_stale_shards(output_dir, 'ru-1b/server.yaml', {'ru-1b/server.yaml'}), [])
+        self.assertEqual(sorted(os.listdir(output_dir)), [
+            'networks.yaml', 'ru-1a', 'server.0001.json.gz', 'server.0001.yaml', 'server.0002.yaml', 'server_group.0001.yaml'
+        ])
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_loader('rust')
+
+
+if __name__ == '__main__':
+    unittest.main()
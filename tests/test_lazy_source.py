@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import load_source_data
+from lazy_source import index_top_level_keys
+from id_prefix import infer_prefix
+
+
+class TestLazySource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.write_source('ecss.yaml', """# exported by reverse tool
+seaf.ta.reverse.cloud_ru.advanced.ecss:
+  tenant.ecss.a:
+    name: ecs-a
+    description: |
+      multi-line
+      text
+""")
+        self.write_source('vpcs.yaml', """---
+'seaf.ta.reverse.cloud_ru.advanced.vpcs':
+  tenant.vpcs.a: {name: vpc-a}
+""")
+        self.write_source('subnets.yaml', """{"seaf.ta.reverse.cloud_ru.advanced.subnets": {"tenant.subnets.a": {"cidr": "10.0.0.0/24"}}}
+""")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_source(self, filename, content):
+        with open(os.path.join(self.tmp_dir.name, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def test_index_top_level_keys(self):
+        self.assertEqual(index_top_level_keys(os.path.join(self.tmp_dir.name, 'ecss.yaml')),
+                         ['seaf.ta.reverse.cloud_ru.advanced.ecss'])
+        self.assertEqual(index_top_level_keys(os.path.join(self.tmp_dir.name, 'vpcs.yaml')),
+                         ['seaf.ta.reverse.cloud_ru.advanced.vpcs'])
+        self.assertIsNone(index_top_level_keys(os.path.join(self.tmp_dir.name, 'subnets.yaml')))
+
+    def test_files_are_parsed_on_first_access(self):
+        source_data = load_source_data(self.tmp_dir.name, lazy=True)
+        # The flow-style file cannot be indexed by a line scan and is parsed up front
+        self.assertEqual(source_data.parsed_file_count, 1)
+        self.assertIn('seaf.ta.reverse.cloud_ru.advanced.ecss', source_data)
+        self.assertFalse(source_data.is_loaded('seaf.ta.reverse.cloud_ru.advanced.ecss'))
+
+        vpcs = source_data.get('seaf.ta.reverse.cloud_ru.advanced.vpcs', {})
+        self.assertEqual(vpcs, {'tenant.vpcs.a': {'name': 'vpc-a'}})
+        self.assertEqual(source_data.parsed_file_count, 2)
+        self.assertFalse(source_data.is_loaded('seaf.ta.reverse.cloud_ru.advanced.ecss'))
+        self.assertEqual(source_data.get('seaf.ta.reverse.cloud_ru.advanced.missing', {}), {})
+
+    def test_prefix_is_inferred_without_parsing(self):
+        os.remove(os.path.join(self.tmp_dir.name, 'subnets.yaml'))
+        self.write_source('ecss.yaml', """seaf.ta.reverse.cloud_ru.advanced.ecss:
+  ecs1: {name: ecs-1}
+  flix.ecss.a: {name: ecs-a}
+""")
+        source_data = load_source_data(self.tmp_dir.name, lazy=True)
+        self.assertEqual(source_data.parsed_file_count, 0)
+        self.assertEqual(infer_prefix(source_data), 'flix')
+        self.assertEqual(source_data.parsed_file_count, 0)
+        self.assertEqual(infer_prefix(load_source_data(self.tmp_dir.name)), 'flix')
+
+    def test_lazy_mapping_matches_eager_load(self):
+        eager = load_source_data(self.tmp_dir.name)
+        lazy = load_source_data(self.tmp_dir.name, lazy=True)
+        self.assertEqual(list(lazy.keys()), list(eager.keys()))
+        self.assertEqual(dict(lazy), eager)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import json
+import hashlib
+import tempfile
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import load_source_data, write_converted_data
+from source_cache import SourceCache
+from output_writer import ConvertedOutput
+from output_manifest import MANIFEST_FILE_NAME, fingerprint_sources, manifest_entry, save_manifest
+
+PREFIX = 'seaf.ta.reverse.cloud_ru.advanced'
+NETWORK_DEVICES = 'seaf.ta.components.network'
+CONVERTER_SOURCES = {'vpcs': ('vpcs', 'subnets'), 'elbs': ('elbs',), 'dc_region': ()}
+
+
+class TestOutputManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sources = {
+            'vpcs.yaml': f"{PREFIX}.vpcs:\n  tenant.vpcs.a: {{name: vpc-a}}\n",
+            'elbs.yaml': f"{PREFIX}.elbs:\n  tenant.elbs.a: {{name: elb-a}}\n",
+            'flow.json': f'{{"{PREFIX}.subnets": {{}}}}\n',
+        }
+        for filename, content in self.sources.items():
+            with open(os.path.join(self.tmp_dir.name, filename), 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def source_path(self, filename):
+        return os.path.join(self.tmp_dir.name, filename)
+
+    def test_files_are_described_with_their_converters_and_inputs(self):
+        output = ConvertedOutput()
+        output.add('network_devices', {NETWORK_DEVICES: {'tenant.vpcs.a.router': {}}}, origin='vpcs')
+        output.add('network_devices', {NETWORK_DEVICES: {'tenant.elbs.a': {}, 'tenant.elbs.b': {}}}, origin='elbs')
+        output.add('network_devices', {NETWORK_DEVICES: {'tenant.vpcs.b.router': {}}}, origin='vpcs')
+        self.assertEqual(output.contributors['network_devices.yaml'], ['vpcs', 'elbs'])
+
+        sources = fingerprint_sources([self.source_path(filename) for filename in sorted(self.sources)])
+        elbs = sources[self.source_path('elbs.yaml')]
+        self.assertEqual(elbs['collections'], ['elbs'])
+        self.assertEqual(elbs['sha256'], hashlib.sha256(self.sources['elbs.yaml'].encode('utf-8')).hexdigest())
+        # JSON files are not indexed, so they count as inputs of every converter that reads sources
+        self.assertIsNone(sources[self.source_path('flow.json')]['collections'])
+
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        data = output.files['network_devices.yaml']
+        # An entity left in the file by an earlier run is merged, and counted, too
+        write_converted_data(output_dir, 'network_devices', {NETWORK_DEVICES: {'tenant.elbs.old': {}}})
+        file_path, digest, _, contents = write_converted_data(output_dir, 'network_devices', data)
+        entry = manifest_entry(digest, contents, ['elbs'], CONVERTER_SOURCES, sources)
+        with open(file_path, 'rb') as f:
+            self.assertEqual(entry['sha256'], hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual((entry['target_keys'], entry['entity_count'], entry['converters']), ([NETWORK_DEVICES], 5, ['elbs']))
+        self.assertEqual(sorted(entry['inputs']), [self.source_path('elbs.yaml'), self.source_path('flow.json')])
+        # Converters without source collections are derived from no input file
+        self.assertEqual(manifest_entry(digest, contents, ['dc_region'], CONVERTER_SOURCES, sources)['inputs'], {})
+
+        entries = {'network_devices.yaml': entry}
+        self.assertTrue(save_manifest(output_dir, entries, sources)[1])
+        self.assertFalse(save_manifest(output_dir, entries, sources)[1])
+        with open(os.path.join(output_dir, MANIFEST_FILE_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['files'], entries)
+        self.assertEqual(manifest['inputs'][self.source_path('elbs.yaml')], {'size': elbs['size'], 'sha256': elbs['sha256']})
+
+    def test_source_hashes_are_reused_from_the_cache(self):
+        file_paths = [self.source_path(filename) for filename in sorted(self.sources)]
+        expected = fingerprint_sources(file_paths)
+        cache = SourceCache(os.path.join(self.tmp_dir.name, 'cache'))
+        with mock.patch('builtins.print'):
+            load_source_data(self.tmp_dir.name, cache=cache)
+        with mock.patch('output_manifest.file_sha256') as file_sha256:
+            self.assertEqual(fingerprint_sources(file_paths, cache), expected)
+        file_sha256.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from output_partition import OutputPartitioner, partition_imports, SHARED_PARTITION
+
+PREFIX = 'seaf.ta.reverse.cloud_ru.advanced'
+SERVER = 'seaf.ta.components.server'
+NETWORK_DEVICES = 'seaf.ta.components.network'
+NETWORK_SEGMENT = 'seaf.ta.services.network_segment'
+
+CONVERTED = {
+    SERVER: {
+        'tenant.ecss.a': {'az': ['tenant.dc_az.ru-1a'], 'location': ['tenant.dc.ru-1a']},
+        'tenant.ecss.b': {'az': [], 'location': []},
+    },
+    NETWORK_DEVICES: {
+        'tenant.vpcs.a.router': {'location': ['tenant.dc.ru-1b']},
+        'tenant.elbs.a': {'external_id': 'elb-1', 'location': ['tenant.dc.ru-1a', 'tenant.dc.ru-1b']},
+    },
+    NETWORK_SEGMENT: {
+        'tenant.vpcs.a': {'external_id': 'a', 'sber': {'location': 'tenant.dc.ru-1b'}},
+    },
+}
+
+
+class TestOutputPartition(unittest.TestCase):
+
+    def assert_partitions(self, partitioner, expected):
+        self.assertEqual(
+            {partition: {key: list(entities) for key, entities in data.items()}
+             for partition, data in partitioner.split(CONVERTED)},
+            expected
+        )
+
+    def test_partition_by_dc_and_az(self):
+        self.assert_partitions(OutputPartitioner('dc'), {
+            'ru-1a': {SERVER: ['tenant.ecss.a']},
+            'ru-1b': {NETWORK_DEVICES: ['tenant.vpcs.a.router'], NETWORK_SEGMENT: ['tenant.vpcs.a']},
+            # Entities without a location or in several DCs are shared
+            SHARED_PARTITION: {SERVER: ['tenant.ecss.b'], NETWORK_DEVICES: ['tenant.elbs.a']},
+        })
+        # Entities without an 'az' field fall back to their DC, which has the name of its AZ
+        self.assert_partitions(OutputPartitioner('az'), {
+            'ru-1a': {SERVER: ['tenant.ecss.a']},
+            'ru-1b': {NETWORK_DEVICES: ['tenant.vpcs.a.router'], NETWORK_SEGMENT: ['tenant.vpcs.a']},
+            SHARED_PARTITION: {SERVER: ['tenant.ecss.b'], NETWORK_DEVICES: ['tenant.elbs.a']},
+        })
+
+    def test_partition_by_source_tenant(self):
+        source_data = {
+            f'{PREFIX}.ecss': {'tenant.ecss.a': {'tenant': 'team/a'}, 'tenant.ecss.b': {'name': 'no tenant'}},
+            f'{PREFIX}.vpcs': {'tenant.vpcs.a': {'tenant': 'team-b'}},
+            f'{PREFIX}.elbs': {'elb-key': {'id': 'elb-1', 'tenant': 'team-b'}},
+        }
+        # Derived IDs (tenant.vpcs.a.router) and external IDs lead back to the source entity
+        self.assert_partitions(OutputPartitioner('tenant', source_data), {
+            'team_a': {SERVER: ['tenant.ecss.a']},
+            'team-b': {NETWORK_DEVICES: ['tenant.vpcs.a.router', 'tenant.elbs.a'], NETWORK_SEGMENT: ['tenant.vpcs.a']},
+            SHARED_PARTITION: {SERVER: ['tenant.ecss.b']},
+        })
+        with self.assertRaises(ValueError):
+            OutputPartitioner('region')
+
+    def test_partition_roots_import_shared_files(self):
+        imports = partition_imports(['ru-1a/server.yaml', '_shared/dc.yaml', 'ru-1a/networks.yaml', 'ru-1b/server.yaml'])
+        self.assertEqual(imports, {
+            '_shared': ['dc.yaml'],
+            'ru-1a': ['server.yaml', 'networks.yaml', '../_shared/dc.yaml'],
+            'ru-1b': ['server.yaml', '../_shared/dc.yaml'],
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
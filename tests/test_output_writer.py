@@ -0,0 +1,176 @@
+import unittest
+import sys
+import os
+import io
+import json
+import tarfile
+import tempfile
+import yaml
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import save_converted_data, parse_source_file
+from output_writer import (
+    ConvertedOutput, write_yaml_bundle, write_tar_stream, write_converted_yaml, render_converted_yaml, split_into_shards,
+    write_converted_json, write_bundle, to_json, root_importable_files, BUNDLE_INDEX_FIELD
+)
+from manual_fill import ManualFill, MANUAL_ZONE_PLACEHOLDER
+
+NETWORK_DEVICES = 'seaf.ta.components.network'
+
+
+class TestOutputWriter(unittest.TestCase):
+
+    def make_output(self):
+        output = ConvertedOutput()
+        output.add('network_devices', {NETWORK_DEVICES: {'tenant.vpcs.a.router': {'title': 'Маршрутизатор'}}})
+        output.add('network_devices', {NETWORK_DEVICES: {'tenant.elbs.a': {'title': 'ELB'}}})
+        output.add('dc_region', {'seaf.ta.services.dc_region': {'tenant.dc_region.russia': {'title': 'Россия'}}})
+        return output
+
+    def test_bundle_matches_saved_files(self):
+        output = self.make_output()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for entity_name, data in (
+                ('network_devices', {NETWORK_DEVICES: {'tenant.vpcs.a.router': {'title': 'Маршрутизатор'}}}),
+                ('network_devices', {NETWORK_DEVICES: {'tenant.elbs.a': {'title': 'ELB'}}}),
+            ):
+                save_converted_data(tmp_dir, entity_name, data)
+            with open(os.path.join(tmp_dir, 'network_devices.yaml'), encoding='utf-8') as f:
+                saved = f.read()
+        rendered = dict(output.rendered_files())
+        self.assertEqual(rendered['network_devices.yaml'], saved)
+        self.assertEqual(list(rendered), ['dc_region.yaml', 'network_devices.yaml', 'root.yaml'])
+        self.assertEqual(yaml.safe_load(rendered['root.yaml']), {'imports': ['dc_region.yaml', 'network_devices.yaml']})
+
+    def test_conflicting_entity_ids_are_reported(self):
+        conflicts = []
+        output = ConvertedOutput(on_conflict=lambda *args: conflicts.append(args))
+        output.add('networks', {'seaf.ta.services.network': {'tenant.subnets.a': {'type': 'LAN'}}}, origin='subnets')
+        # The same entity again is not a conflict
+        output.add('networks', {'seaf.ta.services.network': {'tenant.subnets.a': {'type': 'LAN'}}}, origin='subnets')
+        output.add('networks', {'seaf.ta.services.network': {'tenant.subnets.a': {'type': 'WAN'}}}, origin='eips')
+        self.assertEqual(output.conflicts, 1)
+        self.assertEqual(conflicts, [('seaf.ta.services.network', 'tenant.subnets.a', 'eips', 'subnets')])
+        self.assertEqual(output.files['networks.yaml'], {'seaf.ta.services.network': {'tenant.subnets.a': {'type': 'WAN'}}})
+
+    def test_streamed_yaml_matches_yaml_dump(self):
+        shared_list = ['flix.subnets.a']
+        shared_in_entity = {'network_connection': shared_list, 'backup_connection': shared_list}
+        documents = [
+            # Entities are streamed one at a time; anchors inside an entity are kept
+            {NETWORK_DEVICES: {'flix.vpcs.a.router': {'title': 'Маршрутизатор', 'zone': 'ru-moscow-1a'},
+                               'flix.elbs.a': shared_in_entity, 'flix.elbs.b': {}},
+             'seaf.ta.services.network': {}},
+            # Objects shared between entities are dumped at once to keep their anchors
+            {NETWORK_DEVICES: {'flix.elbs.a': shared_in_entity, 'flix.elbs.b': {'links': shared_list}}},
+            {},
+        ]
+        for data in documents:
+            for dumper in ('python', 'auto'):
+                with self.subTest(data=data, dumper=dumper):
+                    expected = yaml.dump(data, allow_unicode=True, sort_keys=False)
+                    stream = io.StringIO()
+                    write_converted_yaml(stream, data, dumper)
+                    self.assertEqual(stream.getvalue(), expected)
+
+    def test_manual_fill_values_are_written_as_comments(self):
+        segments = {
+            'tenant.vpcs.a': {'sber': {'location': 'tenant.dc.a', 'zone': ManualFill(MANUAL_ZONE_PLACEHOLDER)}},
+            'tenant.vpcs.b': {'sber': {'zone': ManualFill(MANUAL_ZONE_PLACEHOLDER, comment='Укажите зону')}},
+        }
+        self.assertEqual(segments['tenant.vpcs.a']['sber']['zone'], MANUAL_ZONE_PLACEHOLDER)
+        for dumper in ('python', 'auto'):
+            with self.subTest(dumper=dumper):
+                rendered = render_converted_yaml({'seaf.ta.services.network_segment': segments}, dumper)
+                self.assertEqual(rendered, (
+                    "seaf.ta.services.network_segment:\n"
+                    "  tenant.vpcs.a:\n"
+                    "    sber:\n"
+                    "      location: tenant.dc.a\n"
+                    "      zone:  ### <--- Заполнить вручную\n"
+                    "  tenant.vpcs.b:\n"
+                    "    sber:\n"
+                    "      zone:  ### <--- Укажите зону\n"
+                ))
+                self.assertEqual(yaml.safe_load(rendered)['seaf.ta.services.network_segment']['tenant.vpcs.a']['sber']['zone'], None)
+
+    def test_large_files_are_split_into_shards(self):
+        servers = {f'tenant.ecss.{i}': {'title': f'Сервер {i}'} for i in range(5)}
+        data = {'seaf.ta.components.server': servers}
+        self.assertEqual(split_into_shards('server.yaml', data, 5), [('server.yaml', data)])
+        self.assertEqual(split_into_shards('server.yaml', data), [('server.yaml', data)])
+        shards = split_into_shards('server.yaml', data, 2)
+        self.assertEqual([name for name, _ in shards], ['server.0001.yaml', 'server.0002.yaml', 'server.0003.yaml'])
+        self.assertEqual([list(shard['seaf.ta.components.server']) for _, shard in shards],
+                         [['tenant.ecss.0', 'tenant.ecss.1'], ['tenant.ecss.2', 'tenant.ecss.3'], ['tenant.ecss.4']])
+
+        rendered = dict(self.make_output().rendered_files(max_entities=1))
+        self.assertEqual(list(rendered), ['dc_region.yaml', 'network_devices.0001.yaml', 'network_devices.0002.yaml', 'root.yaml'])
+        self.assertEqual(yaml.safe_load(rendered['root.yaml'])['imports'], list(rendered)[:-1])
+        self.assertEqual(list(yaml.safe_load(rendered['network_devices.0002.yaml'])[NETWORK_DEVICES]), ['tenant.elbs.a'])
+
+    def test_json_and_json_lines_files(self):
+        data = {NETWORK_DEVICES: {'tenant.vpcs.a.router': {'title': 'Маршрутизатор', 'zone': ManualFill(MANUAL_ZONE_PLACEHOLDER)},
+                                  'tenant.elbs.a': {'ports': [80, 443]}}}
+        stream = io.StringIO()
+        write_converted_json(stream, data)
+        self.assertEqual(stream.getvalue(), to_json(data) + '\n')
+        # A field filled in manually is written as null, not as its placeholder text
+        written = {NETWORK_DEVICES: {'tenant.vpcs.a.router': {'title': 'Маршрутизатор', 'zone': None},
+                                     'tenant.elbs.a': {'ports': [80, 443]}}}
+        self.assertEqual(json.loads(stream.getvalue()), written)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch('builtins.print'):
+                for output_format in ('json', 'jsonl'):
+                    save_converted_data(tmp_dir, 'network_devices', data, output_format=output_format)
+                    # Saving again merges into the existing file
+                    save_converted_data(tmp_dir, 'network_devices', {NETWORK_DEVICES: {'tenant.elbs.b': {}}},
+                                        output_format=output_format)
+            with open(os.path.join(tmp_dir, 'network_devices.jsonl'), encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], json.dumps({'__collection__': NETWORK_DEVICES}))
+            self.assertEqual(len(lines), 4)
+            expected = {NETWORK_DEVICES: {**written[NETWORK_DEVICES], 'tenant.elbs.b': {}}}
+            for file_name in ('network_devices.json', 'network_devices.jsonl'):
+                self.assertEqual(parse_source_file(os.path.join(tmp_dir, file_name)), (expected, None))
+
+    def test_root_imports_only_yaml_and_json_files(self):
+        file_names = ['server.yaml', 'ru-1a/networks.json', 'server.0001.jsonl', 'dc.yaml.gz', 'dc.json.xz']
+        self.assertEqual(root_importable_files(file_names), ['server.yaml', 'ru-1a/networks.json'])
+        self.assertEqual(root_importable_files(['server.jsonl', 'dc.yaml.gz']), [])
+
+    def test_bundle_index_gives_random_access(self):
+        files = self.make_output().files
+        stream = io.StringIO()
+        write_bundle(stream, sorted(files.items()))
+        content = stream.getvalue().encode('utf-8')
+        header, _, sections = content.partition(b'\n')
+        index = json.loads(header)[BUNDLE_INDEX_FIELD]
+        self.assertEqual([entry['name'] for entry in index], ['dc_region', 'network_devices'])
+        entry = index[1]
+        self.assertEqual((entry['target_keys'], entry['entity_count']), ([NETWORK_DEVICES], 2))
+        section = sections[entry['offset']:entry['offset'] + entry['length']]
+        self.assertEqual(json.loads(section), files['network_devices.yaml'])
+
+    def test_yaml_bundle(self):
+        stream = io.StringIO()
+        write_yaml_bundle(stream, self.make_output().rendered_files())
+        documents = list(yaml.safe_load_all(stream.getvalue()))
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(list(documents[1][NETWORK_DEVICES]), ['tenant.vpcs.a.router', 'tenant.elbs.a'])
+        self.assertIn('--- # network_devices.yaml\n', stream.getvalue())
+
+    def test_tar_stream(self):
+        stream = io.BytesIO()
+        rendered_files = self.make_output().rendered_files()
+        write_tar_stream(stream, rendered_files)
+        stream.seek(0)
+        with tarfile.open(fileobj=stream, mode='r|') as archive:
+            members = {member.name: archive.extractfile(member).read().decode('utf-8') for member in archive}
+        self.assertEqual(members, dict(rendered_files))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import list_source_files
+from pipeline import run_pipeline
+
+PREFIX = 'seaf.ta.reverse.cloud_ru.advanced'
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.write_source('1_vpcs.yaml', f"{PREFIX}.vpcs:\n  tenant.vpcs.a: {{name: vpc-a}}\n")
+        self.write_source('2_ecss.yaml', f"{PREFIX}.ecss:\n  tenant.ecss.a: {{name: ecs-a}}\n")
+        self.write_source('3_ecss.yaml', f"{PREFIX}.ecss:\n  tenant.ecss.b: {{name: ecs-b}}\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_source(self, filename, content):
+        with open(os.path.join(self.tmp_dir.name, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def run_tasks(self, tasks, **kwargs):
+        seen = {}
+        collected = []
+        written = []
+
+        def convert(name, source_data):
+            seen[name] = {key: sorted(value) for key, value in source_data.items()}
+            return f"{name}-result"
+
+        def collect(name, result):
+            collected.append((name, result))
+            return [lambda: written.append(name)]
+
+        def finish():
+            return [lambda: written.append('root')]
+
+        source_data = run_pipeline(list_source_files(self.tmp_dir.name), tasks, convert, collect, finish, **kwargs)
+        self.assertEqual(written, [name for name, _ in collected] + ['root'])
+        return source_data, seen, collected
+
+    def test_converters_start_when_their_sources_are_complete(self):
+        tasks = [('ecss', ('ecss',)), ('vpcs', ('vpcs',)), ('region', ())]
+        source_data, seen, collected = self.run_tasks(tasks)
+        # vpcs only needs the first file and runs before the ecss files are merged
+        self.assertEqual(seen['vpcs'], {f'{PREFIX}.vpcs': ['tenant.vpcs.a']})
+        self.assertEqual(seen['ecss'][f'{PREFIX}.ecss'], ['tenant.ecss.a', 'tenant.ecss.b'])
+        # Results are collected in task order whatever order the converters ran in
+        self.assertEqual(collected, [('ecss', 'ecss-result'), ('vpcs', 'vpcs-result'), ('region', 'region-result')])
+        self.assertEqual(list(source_data), [f'{PREFIX}.vpcs', f'{PREFIX}.ecss'])
+
+    def test_parallel_reads_and_small_queues(self):
+        tasks = [('ecss', ('ecss',)), ('vpcs', ('vpcs',))]
+        _, seen, collected = self.run_tasks(tasks, jobs=2, queue_size=1)
+        self.assertEqual(seen['ecss'][f'{PREFIX}.ecss'], ['tenant.ecss.a', 'tenant.ecss.b'])
+        self.assertEqual([name for name, _ in collected], ['ecss', 'vpcs'])
+
+    def test_unindexed_file_holds_back_converters(self):
+        self.write_source('0_flow.yaml', f'{{"{PREFIX}.subnets": {{"tenant.subnets.a": {{}}}}}}\n')
+        _, seen, _ = self.run_tasks([('subnets', ('subnets',))])
+        self.assertEqual(seen['subnets'][f'{PREFIX}.subnets'], ['tenant.subnets.a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import load_source_data
+from source_cache import SourceCache
+
+
+class TestSourceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp_dir.name, 'input')
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        os.makedirs(self.input_dir)
+        self.write_source('vpcs.yaml', "seaf.ta.reverse.cloud_ru.advanced.vpcs:\n  tenant.vpcs.a:\n    name: vpc-a\n")
+        self.write_source('subnets.yaml', "seaf.ta.reverse.cloud_ru.advanced.subnets:\n  tenant.subnets.a:\n    cidr: 10.0.0.0/24\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_source(self, filename, content):
+        with open(os.path.join(self.input_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def test_unchanged_files_are_reused(self):
+        first_cache = SourceCache(self.cache_dir)
+        first = load_source_data(self.input_dir, cache=first_cache)
+        self.assertEqual((first_cache.hits, first_cache.misses), (0, 2))
+
+        second_cache = SourceCache(self.cache_dir)
+        second = load_source_data(self.input_dir, cache=second_cache)
+        self.assertEqual((second_cache.hits, second_cache.misses), (2, 0))
+        self.assertEqual(second, first)
+
+    def test_changed_file_is_parsed_again(self):
+        load_source_data(self.input_dir, cache=SourceCache(self.cache_dir))
+        self.write_source('vpcs.yaml', "seaf.ta.reverse.cloud_ru.advanced.vpcs:\n  tenant.vpcs.b:\n    name: vpc-b-renamed\n")
+
+        cache = SourceCache(self.cache_dir)
+        source_data = load_source_data(self.input_dir, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(source_data['seaf.ta.reverse.cloud_ru.advanced.vpcs'], {'tenant.vpcs.b': {'name': 'vpc-b-renamed'}})
+
+    def test_touched_file_with_same_content_is_reused(self):
+        load_source_data(self.input_dir, cache=SourceCache(self.cache_dir))
+        vpcs_path = os.path.join(self.input_dir, 'vpcs.yaml')
+        stat = os.stat(vpcs_path)
+        os.utime(vpcs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        cache = SourceCache(self.cache_dir)
+        load_source_data(self.input_dir, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SourceCache(self.cache_dir, max_bytes=0)
+        load_source_data(self.input_dir, cache=cache)
+        self.assertEqual([name for name in os.listdir(self.cache_dir) if name.endswith('.pickle')], [])
+
+        cache = SourceCache(self.cache_dir, max_bytes=0)
+        load_source_data(self.input_dir, cache=cache)
+        self.assertEqual(cache.hits, 0)
+
+    def test_write_errors_disable_the_cache(self):
+        cache = SourceCache(self.cache_dir)
+        with mock.patch('source_cache.pickle.dump', side_effect=OSError(28, 'No space left on device')), \
+                mock.patch('builtins.print') as printed:
+            data = load_source_data(self.input_dir, cache=cache)
+        self.assertEqual(data, load_source_data(self.input_dir))
+        self.assertTrue(cache.write_failed)
+        # Reported once, and neither entries nor a partial index are left behind
+        self.assertEqual(sum('source cache' in str(call) for call in printed.call_args_list), 1)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        with self.assertRaises(OSError):
+            SourceCache(os.path.join(self.input_dir, 'vpcs.yaml', 'cache'))
+
+
+if __name__ == '__main__':
+    unittest.main()
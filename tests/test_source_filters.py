@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import tempfile
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import load_source_data
+from source_filters import EntityFilter
+
+PREFIX = 'seaf.ta.reverse.cloud_ru.advanced'
+
+
+def make_source_data():
+    return {
+        f'{PREFIX}.vpcs': {
+            'tenant.vpcs.vpc-a': {'id': 'vpc-a', 'tenant': 'tenant-a'},
+            'tenant.vpcs.vpc-b': {'id': 'vpc-b', 'tenant': 'tenant-b'},
+        },
+        f'{PREFIX}.subnets': {
+            'tenant.subnets.sub-a': {'id': 'sub-a', 'vpc': 'vpc-a', 'availability_zone': 'ru-moscow-1a'},
+            'tenant.subnets.sub-a2': {'id': 'sub-a2', 'vpc': 'vpc-a', 'availability_zone': 'ru-moscow-1b'},
+            'tenant.subnets.sub-b': {'id': 'sub-b', 'vpc': 'vpc-b', 'availability_zone': 'ru-moscow-1a'},
+        },
+        f'{PREFIX}.ecss': {
+            'tenant.ecss.ecs-a': {'id': 'ecs-a', 'tenant': 'tenant-a', 'az': 'ru-moscow-1a',
+                                  'subnets': ['sub-a'], 'addresses': ['10.0.0.5'], 'security_groups': ['sg-shared']},
+            'tenant.ecss.ecs-b': {'id': 'ecs-b', 'tenant': 'tenant-b', 'az': 'ru-moscow-1b',
+                                  'subnets': ['sub-b'], 'addresses': ['10.1.0.5']},
+        },
+        f'{PREFIX}.security_groups': {
+            'tenant.security_groups.sg-shared': {'id': 'sg-shared', 'tenant': 'tenant-b'},
+        },
+        f'{PREFIX}.eips': {
+            'tenant.eips.eip-a': {'id': 'eip-a', 'int_address': '10.0.0.5'},
+            'tenant.eips.eip-b': {'id': 'eip-b', 'int_address': '10.1.0.5'},
+        },
+    }
+
+
+class TestSourceFilters(unittest.TestCase):
+
+    def test_classify(self):
+        entity_filter = EntityFilter(tenants=['tenant-a'], dcs=['tenant.dc.ru-moscow-1a'])
+        self.assertTrue(entity_filter.classify({'tenant': 'tenant-a', 'az': ['ru-moscow-1a', 'ru-moscow-1b']}))
+        self.assertTrue(entity_filter.classify({'tenant': 'tenant-a', 'DC': 'tenant.dc.ru-moscow-1a'}))
+        self.assertFalse(entity_filter.classify({'tenant': 'tenant-b', 'az': 'ru-moscow-1a'}))
+        self.assertIsNone(entity_filter.classify({'tenant': 'tenant-a'}))
+        self.assertFalse(EntityFilter())
+
+    def test_tenant_filter_keeps_references(self):
+        filtered, matched, added = EntityFilter(tenants='tenant-a').apply(make_source_data())
+        self.assertEqual(matched, 2)
+        self.assertEqual(list(filtered[f'{PREFIX}.ecss']), ['tenant.ecss.ecs-a'])
+        self.assertEqual(list(filtered[f'{PREFIX}.vpcs']), ['tenant.vpcs.vpc-a'])
+        # Subnets carry no tenant: both subnets of the kept VPC stay, the other tenant's subnet is dropped
+        self.assertEqual(list(filtered[f'{PREFIX}.subnets']), ['tenant.subnets.sub-a', 'tenant.subnets.sub-a2'])
+        # Referenced by the kept server although it belongs to another tenant
+        self.assertEqual(list(filtered[f'{PREFIX}.security_groups']), ['tenant.security_groups.sg-shared'])
+        # The EIP bound to the kept server's address
+        self.assertEqual(list(filtered[f'{PREFIX}.eips']), ['tenant.eips.eip-a'])
+        self.assertEqual(added, 4)
+
+    def test_az_filter(self):
+        filtered, _, _ = EntityFilter(azs=['ru-moscow-1b']).apply(make_source_data())
+        self.assertEqual(list(filtered[f'{PREFIX}.ecss']), ['tenant.ecss.ecs-b'])
+        self.assertEqual(list(filtered[f'{PREFIX}.subnets']), ['tenant.subnets.sub-a2', 'tenant.subnets.sub-b'])
+        self.assertEqual(list(filtered[f'{PREFIX}.vpcs']), ['tenant.vpcs.vpc-a', 'tenant.vpcs.vpc-b'])
+        self.assertEqual(list(filtered[f'{PREFIX}.eips']), ['tenant.eips.eip-b'])
+        self.assertEqual(filtered[f'{PREFIX}.security_groups'], {})
+
+    def test_filter_applied_while_loading(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for collection_key, entities in make_source_data().items():
+                with open(os.path.join(tmp_dir, f"{collection_key.split('.')[-1]}.yaml"), 'w', encoding='utf-8') as f:
+                    yaml.dump({collection_key: entities}, f)
+            source_data = load_source_data(tmp_dir, lazy=True, entity_filter=EntityFilter(tenants=['tenant-b']))
+        self.assertIsInstance(source_data, dict)
+        self.assertEqual(list(source_data[f'{PREFIX}.ecss']), ['tenant.ecss.ecs-b'])
+        self.assertEqual(list(source_data[f'{PREFIX}.subnets']), ['tenant.subnets.sub-b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from source_sample import SourceSample
+
+PREFIX = 'seaf.ta.reverse.cloud_ru.advanced'
+
+
+def make_source_data(size=20):
+    return {
+        f'{PREFIX}.vpcs': {
+            f'tenant.vpcs.vpc-{i}': {'id': f'vpc-{i}'} for i in range(size)
+        },
+        f'{PREFIX}.subnets': {
+            f'tenant.subnets.sub-{i}': {'id': f'sub-{i}', 'vpc': f'vpc-{i}'} for i in range(size)
+        },
+        f'{PREFIX}.ecss': {
+            f'tenant.ecss.ecs-{i}': {'id': f'ecs-{i}', 'subnets': [f'sub-{i}'], 'addresses': [f'10.0.0.{i}']}
+            for i in range(size)
+        },
+        f'{PREFIX}.eips': {
+            f'tenant.eips.eip-{i}': {'id': f'eip-{i}', 'int_address': f'10.0.0.{i}'} for i in range(size)
+        },
+    }
+
+
+class TestSourceSample(unittest.TestCase):
+
+    def test_sample_is_reproducible(self):
+        first, picked, _ = SourceSample(count=3, seed=7).apply(make_source_data())
+        second, _, _ = SourceSample(count=3, seed=7).apply(make_source_data())
+        other, _, _ = SourceSample(count=3, seed=8).apply(make_source_data())
+        self.assertEqual(picked, 12)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_sample_follows_references(self):
+        sampled, _, _ = SourceSample(count=2).apply(make_source_data())
+        subnets = sampled[f'{PREFIX}.subnets']
+        vpc_ids = {details['id'] for details in sampled[f'{PREFIX}.vpcs'].values()}
+        ecs_addresses = set()
+        for details in sampled[f'{PREFIX}.ecss'].values():
+            self.assertIn(f"tenant.subnets.{details['subnets'][0]}", subnets)
+            ecs_addresses.update(details['addresses'])
+        for details in subnets.values():
+            self.assertIn(details['vpc'], vpc_ids)
+        for details in sampled[f'{PREFIX}.eips'].values():
+            self.assertIn(details['int_address'], ecs_addresses)
+
+    def test_sample_fraction(self):
+        sample = SourceSample(fraction=0.25)
+        self.assertEqual(sample.sample_size(20), 5)
+        self.assertEqual(sample.sample_size(1), 1)
+        self.assertEqual(sample.sample_size(0), 0)
+        self.assertEqual(SourceSample(count=50).sample_size(20), 20)
+        with self.assertRaises(ValueError):
+            SourceSample(fraction=1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
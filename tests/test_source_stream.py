@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from file_io import load_source_data
+from source_stream import iter_yaml_entities
+
+SOURCE = """seaf.ta.reverse.cloud_ru.advanced.ecss:
+  tenant.ecss.a:
+    name: ecs-a
+    description: "Сервер"
+    defaults: &defaults
+      os: {type: Linux, bit: '64'}
+    disks:
+      - disk-1: {size: 50, az: ru-moscow-1a}
+  tenant.ecss.b:
+    <<: *defaults
+    name: ecs-b
+    created: 2024-03-01
+metadata:
+  exported: true
+"""
+
+LOADERS = [yaml.SafeLoader] + ([yaml.CSafeLoader] if hasattr(yaml, 'CSafeLoader') else [])
+
+
+class TestSourceStream(unittest.TestCase):
+
+    def test_streamed_entities_match_full_parse(self):
+        expected = yaml.safe_load(SOURCE)['seaf.ta.reverse.cloud_ru.advanced.ecss']
+        for loader_class in LOADERS:
+            with self.subTest(loader=loader_class.__name__):
+                entities = iter_yaml_entities(io.StringIO(SOURCE), 'seaf.ta.reverse.cloud_ru.advanced.ecss', loader_class)
+                self.assertEqual(list(entities), list(expected.items()))
+
+    def test_missing_collection_yields_nothing(self):
+        self.assertEqual(list(iter_yaml_entities(io.StringIO(SOURCE), 'seaf.ta.reverse.cloud_ru.advanced.vpcs')), [])
+        self.assertEqual(list(iter_yaml_entities(io.StringIO(''), 'seaf.ta.reverse.cloud_ru.advanced.ecss')), [])
+
+    def test_lazy_source_streams_without_materializing(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'ecss.yaml'), 'w', encoding='utf-8') as f:
+                f.write(SOURCE)
+            source_data = load_source_data(tmp_dir, lazy=True)
+            entity_ids = [entity_id for entity_id, _ in source_data.iter_entities('seaf.ta.reverse.cloud_ru.advanced.ecss')]
+            self.assertEqual(entity_ids, ['tenant.ecss.a', 'tenant.ecss.b'])
+            self.assertEqual(source_data.parsed_file_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
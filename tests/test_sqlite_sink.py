@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from sqlite_sink import parse_sink, write_sqlite_sink
+from manual_fill import ManualFill, MANUAL_ZONE_PLACEHOLDER
+
+SERVER = 'seaf.ta.components.server'
+NETWORK_DEVICES = 'seaf.ta.components.network'
+NETWORK_SEGMENT = 'seaf.ta.services.network_segment'
+
+
+class TestSqliteSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'estate.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def query(self, sql, *params):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def test_entities_are_upserted_with_indexed_columns(self):
+        files = {
+            'server.yaml': {SERVER: {
+                'tenant.ecss.a': {'title': 'Сервер', 'external_id': 'a', 'az': ['tenant.dc_az.ru-1a'],
+                                  'location': ['tenant.dc.ru-1a']},
+                'tenant.ecss.b': {'title': 'Без зоны', 'external_id': None, 'az': [], 'location': []},
+            }},
+            'network_devices.yaml': {NETWORK_DEVICES: {
+                'tenant.elbs.a': {'segment': 'tenant.vpcs.a', 'location': ['tenant.dc.ru-1a', 'tenant.dc.ru-1b']},
+            }},
+            'network_segment.yaml': {NETWORK_SEGMENT: {
+                'tenant.vpcs.a': {'sber': {'location': 'tenant.dc.ru-1a', 'zone': ManualFill(MANUAL_ZONE_PLACEHOLDER)}},
+            }},
+        }
+        # A batch size of 1 goes through several executemany() calls
+        self.assertEqual(write_sqlite_sink(self.db_path, files, batch_size=1), 4)
+        self.assertEqual(
+            self.query("SELECT entity_id, location, segment, az, external_id FROM entities ORDER BY entity_id"),
+            [('tenant.ecss.a', 'tenant.dc.ru-1a', None, 'tenant.dc_az.ru-1a', 'a'),
+             ('tenant.ecss.b', None, None, None, None),
+             ('tenant.elbs.a', 'tenant.dc.ru-1a', 'tenant.vpcs.a', None, None),
+             ('tenant.vpcs.a', 'tenant.dc.ru-1a', None, None, None)]
+        )
+        body = self.query("SELECT body FROM entities WHERE entity_id = 'tenant.ecss.a'")[0][0]
+        self.assertEqual(json.loads(body), files['server.yaml'][SERVER]['tenant.ecss.a'])
+        # The field to be filled in manually is stored as null, not as its placeholder text
+        body = self.query("SELECT body FROM entities WHERE entity_id = 'tenant.vpcs.a'")[0][0]
+        self.assertEqual(json.loads(body), {'sber': {'location': 'tenant.dc.ru-1a', 'zone': None}})
+        # Every value of a reference list can be queried, not only the first one
+        self.assertEqual(
+            self.query("SELECT entity_id FROM entity_fields WHERE field = 'location' AND value = 'tenant.dc.ru-1b'"),
+            [('tenant.elbs.a',)]
+        )
+
+        # Writing again updates rows in place instead of adding new ones
+        files['network_devices.yaml'][NETWORK_DEVICES]['tenant.elbs.a'] = {'segment': 'tenant.vpcs.b', 'location': []}
+        self.assertEqual(write_sqlite_sink(self.db_path, files), 4)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM entities"), [(4,)])
+        self.assertEqual(
+            self.query("SELECT field, value FROM entity_fields WHERE entity_id = 'tenant.elbs.a'"),
+            [('segment', 'tenant.vpcs.b')]
+        )
+        indexes = {name for (name,) in self.query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'entities_location', 'entities_segment', 'entities_az', 'entities_external_id'} <= indexes)
+
+    def test_sink_specification(self):
+        self.assertEqual(parse_sink('sqlite:out/estate.db'), ('sqlite', 'out/estate.db'))
+        for spec in ('estate.db', 'sqlite:', 'postgres:estate'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    parse_sink(spec)
+
+
+if __name__ == '__main__':
+    unittest.main()
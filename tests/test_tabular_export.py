@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import csv
+import io
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+from tabular_export import save_tables, write_server_tables, SERVER_TARGET, NETWORK_TARGET
+
+FILES = {
+    'server.yaml': {SERVER_TARGET: {
+        'tenant.ecss.a': {
+            'title': 'ecs-a', 'os': {'type': 'Linux', 'bit': 'x64'}, 'cpu': {'cores': '4', 'frequency': 2500},
+            'ram': 8, 'az': ['tenant.dc_az.ru-1a'], 'location': ['tenant.dc.ru-1a'],
+            'subnets': ['tenant.subnets.a', 'tenant.subnets.b'],
+            'disks': [{'size': 50, 'type': 'SSD', 'device': '/dev/vda', 'az': 'tenant.dc_az.ru-1a'},
+                      {'size': 100, 'type': 'SAS', 'device': '/dev/vdb', 'az': None}],
+        },
+        'tenant.ecss.b': {'title': 'ecs-b, "test"', 'cpu': {'cores': None, 'frequency': 0}, 'ram': 0, 'disks': []},
+    }},
+    'networks.yaml': {NETWORK_TARGET: {
+        'tenant.subnets.a': {'title': 'subnet-a', 'type': 'LAN', 'ipnetwork': '10.0.0.0/24', 'segment': ['tenant.vpcs.a']},
+        'tenant.eips.a': {'title': 'eip', 'type': 'WAN', 'wan_ip': '8.8.8.8', 'segment': []},
+    }},
+}
+
+
+class TestTabularExport(unittest.TestCase):
+
+    def read_table(self, text, delimiter=','):
+        return list(csv.DictReader(io.StringIO(text), delimiter=delimiter))
+
+    def test_servers_and_disks_in_one_pass(self):
+        server_stream, disk_stream = io.StringIO(), io.StringIO()
+        self.assertEqual(write_server_tables(server_stream, disk_stream, FILES), (2, 2))
+        servers = self.read_table(server_stream.getvalue())
+        self.assertEqual(
+            [(row['id'], row['cpu_cores'], row['cpu_frequency_mhz'], row['ram_gb'], row['disk_count'], row['disk_total_gb'])
+             for row in servers],
+            [('tenant.ecss.a', '4', '2500', '8', '2', '150'), ('tenant.ecss.b', '', '0', '0', '0', '0')]
+        )
+        # Non-numeric values leave numeric columns empty; reference lists share one cell
+        self.assertEqual(servers[0]['os_bit'], '')
+        self.assertEqual(servers[0]['subnets'], 'tenant.subnets.a;tenant.subnets.b')
+        self.assertEqual(servers[1]['title'], 'ecs-b, "test"')
+        disks = self.read_table(disk_stream.getvalue())
+        self.assertEqual(
+            [(row['server_id'], row['disk_index'], row['size_gb'], row['device'], row['az']) for row in disks],
+            [('tenant.ecss.a', '0', '50', '/dev/vda', 'tenant.dc_az.ru-1a'), ('tenant.ecss.a', '1', '100', '/dev/vdb', '')]
+        )
+
+    def test_tables_are_saved_once(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = save_tables(tmp_dir, FILES, 'tsv')
+            self.assertEqual(results, [('servers.tsv', 2, True), ('server_disks.tsv', 2, True), ('networks.tsv', 2, True)])
+            self.assertEqual([changed for _, _, changed in save_tables(tmp_dir, FILES, 'tsv')], [False, False, False])
+            with open(os.path.join(tmp_dir, 'networks.tsv'), encoding='utf-8', newline='') as f:
+                networks = self.read_table(f.read(), delimiter='\t')
+        self.assertEqual([(row['id'], row['cidr'], row['wan_ip'], row['segment']) for row in networks],
+                         [('tenant.subnets.a', '10.0.0.0/24', '', 'tenant.vpcs.a'), ('tenant.eips.a', '', '8.8.8.8', '')])
+
+
+if __name__ == '__main__':
+    unittest.main()
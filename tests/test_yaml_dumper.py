@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
+
+import output_writer
+from output_writer import render_converted_yaml, resolve_dumper, is_libyaml_safe, ConvertedYamlDumper
+
+NETWORK_DEVICES = 'seaf.ta.components.network'
+
+
+def make_converted_data():
+    description = 'Маршрутизатор VPC с длинным описанием, которое не помещается в одну строку вывода YAML ' * 3
+    return {
+        NETWORK_DEVICES: {
+            'flix.vpcs.vpc-1.router': {
+                'title': 'Маршрутизатор VPC vpc-1',
+                'description': description.strip(),
+                'network_connection': ['flix.subnets.a', 'flix.subnets.b'],
+                'notes': 'Resource Name: vpc-1\n\nSubnets: 2',
+                'empty': [],
+                'count': 3,
+                'ratio': 0.5,
+                'enabled': True,
+                'owner': None,
+                'port': '8080',
+                'tag': 'yes',
+                'selector': 'app: web # front',
+            }
+        }
+    }
+
+
+@unittest.skipIf(output_writer.CSafeDumper is None, 'PyYAML is built without LibYAML')
+class TestYamlDumper(unittest.TestCase):
+
+    def assert_identical(self, data):
+        self.assertEqual(render_converted_yaml(data, 'libyaml'), render_converted_yaml(data, 'python'))
+
+    def test_converted_data_is_byte_identical(self):
+        data = make_converted_data()
+        self.assertTrue(is_libyaml_safe(data))
+        self.assert_identical(data)
+        rendered = render_converted_yaml(data, 'libyaml')
+        self.assertIn('title: Маршрутизатор VPC vpc-1\n', rendered)
+
+    def test_double_quoted_strings_fall_back_to_python(self):
+        long_text = 'Описание с табуляцией\tи переводом строки \n' * 4
+        for value in (long_text, 'smile \U0001F600', 'line\u2028separator', '\ufeffbom', 'nel\x85', 'a \n b'):
+            with self.subTest(value=value):
+                data = {NETWORK_DEVICES: {'flix.elbs.a': {'description': value}}}
+                self.assertFalse(is_libyaml_safe(data))
+                self.assert_identical(data)
+        self.assertFalse(is_libyaml_safe({NETWORK_DEVICES: {'multi\nline': {}}}))
+        self.assertFalse(is_libyaml_safe({NETWORK_DEVICES: {'flix.elbs.a': {'ports': (80, 443)}}}))
+
+    def test_long_non_ascii_keys_fall_back_to_python(self):
+        # 83 characters, 137 UTF-8 bytes: a simple key for the Python emitter, a complex one for LibYAML
+        key = 'tenant.branches.' + 'Филиал_в_городе_Москва_корпус_2_' * 2 + 'Филиал_корпус'
+        self.assertLess(len(key), 128)
+        self.assertGreaterEqual(len(key.encode('utf-8')), 128)
+        data = {'seaf.ta.services.office': {key: {'title': 'Филиал'}}}
+        self.assertFalse(is_libyaml_safe(data))
+        self.assert_identical(data)
+        self.assertTrue(render_converted_yaml(data, 'auto').startswith(f"seaf.ta.services.office:\n  {key}:\n"))
+        # Values are not limited
+        self.assertTrue(is_libyaml_safe({'seaf.ta.services.office': {'tenant.branches.a': {'title': key}}}))
+
+    def test_empty_keys_fall_back_to_python(self):
+        data = {NETWORK_DEVICES: {'flix.elbs.a': {'tags': {'': 'без ключа', 'env': ''}}}}
+        self.assertFalse(is_libyaml_safe(data))
+        self.assert_identical(data)
+        self.assertIn("? ''\n", render_converted_yaml(data, 'libyaml'))
+        # Empty values are not affected
+        self.assertTrue(is_libyaml_safe({NETWORK_DEVICES: {'flix.elbs.a': {'env': ''}}}))
+
+    def test_shared_objects_are_byte_identical(self):
+        shared = {'title': 'Общий объект'}
+        self.assert_identical({NETWORK_DEVICES: {'flix.elbs.a': shared, 'flix.elbs.b': shared}})
+
+    def test_fallback_without_libyaml(self):
+        with mock.patch.object(output_writer, 'CSafeDumper', None):
+            with mock.patch('builtins.print') as printed:
+                self.assertEqual(resolve_dumper('libyaml'), ('python', ConvertedYamlDumper))
+            printed.assert_called_once()
+            self.assertEqual(resolve_dumper('auto'), ('python', ConvertedYamlDumper))
+            self.assertEqual(render_converted_yaml(make_converted_data()), render_converted_yaml(make_converted_data(), 'python'))
+        with self.assertRaises(ValueError):
+            resolve_dumper('fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
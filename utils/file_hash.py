@@ -0,0 +1,14 @@
+# utils/file_hash.py
+
+import hashlib
+
+def file_sha256(file_path):
+    """Returns the SHA-256 hex digest of a file's content, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
@@ -1,47 +1,524 @@
+import gzip
+import hashlib
+import io
+import json
+import lzma
 import os
+import pickle
+import re
+import sys
+import tarfile
+import zipfile
 import yaml
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
-def load_source_data(input_dir):
+from lazy_source import LazySourceData, index_yaml_lines
+from source_merge import merge_source_data
+from file_hash import file_sha256
+from source_files import SNIFF_BYTES, is_archive, strip_compression_suffix, open_source_binary, iter_archive_members
+from source_stream import iter_yaml_entities
+from output_writer import (
+    JSONL_COLLECTION_FIELD, BUNDLE_FILE_NAME, OUTPUT_COMPRESSIONS, Utf8TextWriter, write_converted, write_bundle,
+    render_root_yaml, output_file_name, describe_contents
+)
+
+try:
+    from yaml import CSafeLoader
+except ImportError:  # PyYAML was built without the LibYAML bindings
+    CSafeLoader = None
+
+# Supported YAML loader backends: 'auto' prefers LibYAML and falls back to pure Python.
+LOADER_BACKENDS = ('auto', 'libyaml', 'python')
+
+def resolve_loader(backend='auto'):
+    """
+    Resolves a YAML loader backend name to a (backend_name, loader_class) pair.
+    'libyaml' uses yaml.CSafeLoader, 'python' uses yaml.SafeLoader. If LibYAML is not
+    available, the pure-Python loader is returned instead.
+    """
+    if backend not in LOADER_BACKENDS:
+        raise ValueError(f"Unknown YAML loader backend '{backend}'. Expected one of: {', '.join(LOADER_BACKENDS)}")
+    if backend == 'python':
+        return 'python', yaml.SafeLoader
+    if CSafeLoader is None:
+        if backend == 'libyaml':
+            print("[WARNING] LibYAML is not available. Falling back to the pure-Python YAML loader.")
+        return 'python', yaml.SafeLoader
+    return 'libyaml', CSafeLoader
+
+# Source file extensions and the format they are parsed as
+SOURCE_FORMATS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Input path that stands for a stream of source documents on standard input
+STDIN_PATH = '-'
+
+# Errors that make a single source file or archive member unreadable
+SOURCE_ERRORS = (yaml.YAMLError, ValueError, EOFError, OSError, lzma.LZMAError)
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, OSError)
+
+def is_stdin(path):
+    """Returns True if an input path stands for standard input."""
+    return str(path) == STDIN_PATH
+
+def source_format_from_name(name):
+    """Returns the format implied by a file name, ignoring a .gz/.xz/.bz2 suffix, or None."""
+    return SOURCE_FORMATS.get(os.path.splitext(strip_compression_suffix(str(name)))[1].lower())
+
+def list_source_files(input_dir, recursive=False):
+    """
+    Returns the source files (YAML, JSON, JSON Lines, optionally .gz/.xz/.bz2 compressed) of a
+    directory as full paths, sorted by file name. With recursive=True sub-directories are
+    searched as well (hidden ones are skipped) and files are sorted by their relative path.
+    """
+    if not recursive:
+        return [
+            os.path.join(input_dir, filename)
+            for filename in sorted(os.listdir(input_dir))
+            if source_format_from_name(filename)
+        ]
+    relative_paths = []
+    for dir_path, dir_names, filenames in os.walk(input_dir):
+        dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith('.')]
+        for filename in filenames:
+            if source_format_from_name(filename):
+                relative_paths.append(os.path.relpath(os.path.join(dir_path, filename), input_dir))
+    return [os.path.join(input_dir, relative_path) for relative_path in sorted(relative_paths)]
+
+def list_input_sources(input_paths, recursive=False):
+    """
+    Expands input paths (directories, archives, single source files or '-' for standard input)
+    into the list of source files to load, keeping the order of input_paths. Missing inputs are
+    reported and skipped.
+    """
+    if isinstance(input_paths, (str, os.PathLike)):
+        input_paths = [input_paths]
+    file_paths = []
+    for input_path in input_paths:
+        if is_stdin(input_path):
+            file_paths.append(STDIN_PATH)
+        elif os.path.isdir(input_path):
+            file_paths.extend(list_source_files(input_path, recursive))
+        elif os.path.isfile(input_path) and (is_archive(input_path) or source_format_from_name(input_path)):
+            file_paths.append(str(input_path))
+        else:
+            print(f"[ERROR] Input directory not found: {input_path}")
+    return file_paths
+
+def _sniff_format(source_format, stream):
+    """
+    Refines the format implied by the name from the first bytes of a peekable binary stream.
+    Content starting with '{' is JSON, or JSON Lines if the first line is a complete JSON object
+    followed by more lines.
+    """
+    if source_format == 'jsonl':
+        return source_format
+    head = stream.peek(SNIFF_BYTES)[:SNIFF_BYTES].decode('utf-8', errors='ignore').lstrip()
+    if not head.startswith('{'):
+        return source_format
+    first_line, _, rest = head.partition('\n')
+    try:
+        first_record = json.loads(first_line)
+    except ValueError:
+        return 'json'
+    if isinstance(first_record, dict) and rest.strip():
+        return 'jsonl'
+    return 'json'
+
+def detect_source_format(file_path):
+    """
+    Detects the format of a source file: 'yaml', 'json' or 'jsonl'.
+    The extension (ignoring a compression suffix) gives the default, the content refines it.
+    """
+    with open_source_binary(file_path) as f:
+        return _sniff_format(source_format_from_name(file_path) or 'yaml', f)
+
+def iter_jsonl_records(stream):
+    """
+    Yields (collection_key, entity_id, details) from a JSON Lines stream.
+    Each line is a {entity_id: details} record of the collection declared by the last
+    {"__collection__": "<key>"} header line.
+    """
+    collection_key = None
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object")
+        if JSONL_COLLECTION_FIELD in record:
+            collection_key = record[JSONL_COLLECTION_FIELD]
+            continue
+        if collection_key is None:
+            raise ValueError(f"line {line_number}: record before a '{JSONL_COLLECTION_FIELD}' header line")
+        for entity_id, details in record.items():
+            yield collection_key, entity_id, details
+
+def iter_json_documents(text):
+    """Yields the JSON values of a text holding several JSON documents separated by whitespace."""
+    decoder = json.JSONDecoder()
+    position = 0
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            return
+        document, position = decoder.raw_decode(text, position)
+        yield document
+
+def _parse_json_documents(text, origin):
+    """
+    Parses a sequence of JSON documents. Documents are {collection_key: {entity_id: details}}
+    objects until a {"__collection__": "<key>"} header, after which they are entity records of
+    that collection as in JSON Lines.
+    """
+    data = {}
+    collection_key = None
+    for number, document in enumerate(iter_json_documents(text), start=1):
+        if not isinstance(document, dict):
+            raise ValueError(f"document {number}: expected a JSON object")
+        if JSONL_COLLECTION_FIELD in document:
+            collection_key = document[JSONL_COLLECTION_FIELD]
+        elif collection_key is None:
+            merge_source_data(data, document, f"{origin} document {number}")
+        else:
+            merge_source_data(data, {collection_key: document}, f"{origin} document {number}")
+    return data
+
+def parse_source_stream(binary_stream, loader, origin='stdin'):
+    """
+    Parses a stream of several source documents: YAML documents separated by '---', or JSON
+    documents / JSON Lines records (see _parse_json_documents()). The documents are merged with
+    merge_source_data() in stream order.
+    """
+    source_format, stream = _open_text('', binary_stream)
+    if source_format in ('json', 'jsonl'):
+        return _parse_json_documents(stream.read(), origin)
+    data = {}
+    for number, document in enumerate(yaml.load_all(stream, Loader=loader), start=1):
+        if isinstance(document, dict):
+            merge_source_data(data, document, f"{origin} document {number}")
+    return data
+
+def _open_text(name, binary_stream):
+    """Returns the detected format and a text stream for a binary source stream."""
+    source_format = _sniff_format(source_format_from_name(name) or 'yaml', binary_stream)
+    return source_format, io.TextIOWrapper(binary_stream, encoding='utf-8')
+
+def _parse_binary(name, binary_stream, loader):
+    source_format, stream = _open_text(name, binary_stream)
+    if source_format == 'jsonl':
+        data = {}
+        for collection_key, entity_id, details in iter_jsonl_records(stream):
+            data.setdefault(collection_key, {})[entity_id] = details
+        return data
+    if source_format == 'json':
+        text = stream.read()
+        try:
+            return json.loads(text)
+        except ValueError:
+            # Not JSON after all (e.g. a YAML flow mapping); let the YAML parser decide
+            return yaml.load(text, Loader=loader)
+    return yaml.load(stream, Loader=loader)
+
+def _parse_archive(archive_path, loader):
+    """
+    Parses the source files inside a tar or zip archive in one pass over the archive.
+    Members are merged with merge_source_data() in member name order, like the files of an input directory.
+    """
+    parsed_members = []
+    errors = []
+    try:
+        for member_name, member_stream in iter_archive_members(archive_path):
+            if not source_format_from_name(member_name):
+                continue
+            try:
+                parsed_members.append((member_name, _parse_binary(member_name, member_stream, loader)))
+            except SOURCE_ERRORS as e:
+                errors.append(f"{member_name}: {e}")
+    except ARCHIVE_ERRORS as e:
+        errors.append(str(e))
+
+    data = {}
+    for member_name, member_data in sorted(parsed_members, key=lambda item: item[0]):
+        if isinstance(member_data, dict):
+            merge_source_data(data, member_data, f"{os.path.basename(archive_path)}:{member_name}")
+    return data, '; '.join(errors) or None
+
+def parse_source_file(file_path, backend='auto'):
+    """
+    Parses a single source file and returns a (data, error) pair.
+    The format is taken from the name and content (see detect_source_format()); compressed
+    files are decompressed while parsing and archives are parsed member by member. All formats
+    produce the same {collection_key: {entity_id: details}} shape. The path '-' reads a stream of
+    documents from standard input (see parse_source_stream()).
+    Errors are returned as text instead of raised so the function can run in a worker process.
+    An archive with some broken members returns the data of the others along with the error.
+    """
+    _, loader = resolve_loader(backend)
+    if is_stdin(file_path):
+        try:
+            return parse_source_stream(io.BufferedReader(sys.stdin.buffer, SNIFF_BYTES), loader), None
+        except SOURCE_ERRORS as e:
+            return None, str(e)
+    if is_archive(file_path):
+        return _parse_archive(file_path, loader)
+    try:
+        with open_source_binary(file_path) as f:
+            return _parse_binary(file_path, f, loader), None
+    except SOURCE_ERRORS as e:
+        return None, str(e)
+
+def _index_binary(name, binary_stream):
+    source_format, stream = _open_text(name, binary_stream)
+    if source_format == 'yaml':
+        return index_yaml_lines(stream)
+    if source_format == 'jsonl':
+        keys = []
+        for line in stream:
+            if JSONL_COLLECTION_FIELD in line:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return None
+                collection_key = record.get(JSONL_COLLECTION_FIELD) if isinstance(record, dict) else None
+                if collection_key is not None and collection_key not in keys:
+                    keys.append(collection_key)
+        return keys
+    return None
+
+def index_source_keys(file_path):
     """
-    Loads all YAML files from a directory and merges them into a single dictionary.
-    It assumes each YAML file has a single top-level key representing the entity type.
+    Returns the top-level keys of a source file without parsing it, or None if that is not possible.
+    YAML files are scanned line by line, JSON Lines files by their collection headers only.
     """
-    if not os.path.isdir(input_dir):
-        print(f"[ERROR] Input directory not found: {input_dir}")
+    if is_stdin(file_path):
+        # Standard input can only be read once
+        return None
+    try:
+        if not is_archive(file_path):
+            with open_source_binary(file_path) as f:
+                return _index_binary(file_path, f)
+        keys = []
+        for member_name, member_stream in iter_archive_members(file_path):
+            if not source_format_from_name(member_name):
+                continue
+            member_keys = _index_binary(member_name, member_stream)
+            if member_keys is None:
+                return None
+            keys.extend(key for key in member_keys if key not in keys)
+        return keys
+    except SOURCE_ERRORS + ARCHIVE_ERRORS:
+        # Let the parser report the problem
+        return None
+
+def _stream_binary(name, binary_stream, collection_key, loader):
+    source_format, stream = _open_text(name, binary_stream)
+    if source_format == 'yaml':
+        yield from iter_yaml_entities(stream, collection_key, loader)
+    elif source_format == 'jsonl':
+        for record_key, entity_id, details in iter_jsonl_records(stream):
+            if record_key == collection_key:
+                yield entity_id, details
+    else:
+        data = json.load(stream)
+        yield from ((data if isinstance(data, dict) else {}).get(collection_key) or {}).items()
+
+def stream_source_file(file_path, collection_key, loader=yaml.SafeLoader):
+    """Yields (entity_id, details) pairs of one collection of a source file, one entity at a time."""
+    if is_archive(file_path):
+        for member_name, member_stream in iter_archive_members(file_path):
+            if source_format_from_name(member_name):
+                yield from _stream_binary(member_name, member_stream, collection_key, loader)
+        return
+    with open_source_binary(file_path) as f:
+        yield from _stream_binary(file_path, f, collection_key, loader)
+
+def _parse_source_files(file_paths, backend, jobs):
+    """
+    Parses files serially or in a process pool; results keep the order of file_paths.
+    Standard input is always parsed in this process.
+    """
+    pool_paths = [file_path for file_path in file_paths if not is_stdin(file_path)]
+    if jobs <= 1 or len(pool_paths) <= 1:
+        return [parse_source_file(file_path, backend) for file_path in file_paths]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(pool_paths))) as executor:
+        pool_results = iter(list(executor.map(parse_source_file, pool_paths, repeat(backend))))
+    return [parse_source_file(file_path, backend) if is_stdin(file_path) else next(pool_results)
+            for file_path in file_paths]
+
+def _load_source_file(file_path, backend, cache):
+    """Returns the parsed content of one source file, going through the cache if one is given."""
+    if is_stdin(file_path):
+        cache = None
+    if cache is not None:
+        hit, data = cache.get(file_path)
+        if hit:
+            return data
+    data, error = parse_source_file(file_path, backend)
+    if error:
+        print(f"Error parsing source file {os.path.basename(file_path)}: {error}")
+        return data
+    if cache is not None:
+        cache.put(file_path, data)
+        cache.save()
+    return data
+
+def load_source_data(input_dir, backend='auto', jobs=1, cache=None, lazy=False, recursive=False, entity_filter=None, sample=None):
+    """
+    Loads all source files (YAML, JSON, JSON Lines) from a directory and merges them into a single dictionary.
+    input_dir may also be a list of directories, tar/zip archives or single source files, which
+    are loaded in the given order; with recursive=True sub-directories are searched too.
+    Compressed files (.gz, .xz, .bz2) are decompressed while parsing and archives are read
+    without extracting them to disk.
+    Collections split across several files are merged entity by entity (see merge_source_data());
+    duplicate entity IDs are reported and the later definition is kept.
+    The YAML loader backend is resolved with resolve_loader() and reported once per call.
+    With jobs > 1 the files are parsed in a pool of worker processes (jobs=0 uses all CPUs);
+    results are always merged in file name order, so the output does not depend on jobs.
+    If a SourceCache is given, unchanged files are taken from it and only changed files are parsed.
+    With lazy=True a LazySourceData mapping is returned instead: files are only indexed here and
+    each one is parsed when a converter first reads one of its keys, and streaming converters can
+    read not yet parsed collections entity by entity with LazySourceData.iter_entities().
+    If an EntityFilter is given, non-matching entities are dropped before the data is returned
+    (see EntityFilter.apply()); a SourceSample then reduces the data to a seeded, reference-closed
+    subset. Both need every collection, so lazy loading is turned off.
+    """
+    file_paths = list_input_sources(input_dir, recursive)
+    if not file_paths:
         return {}
 
+    backend_name, loader = resolve_loader(backend)
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
+    print(f"  YAML loader backend: {backend_name}, load jobs: {jobs}")
+
+    if lazy and (entity_filter or sample):
+        print("  [WARNING] Entity filters and sampling need all source collections. Lazy loading is disabled.")
+        lazy = False
+    if lazy:
+        source_data = LazySourceData(
+            file_paths,
+            lambda file_path: _load_source_file(file_path, backend_name, cache),
+            stream_file=lambda file_path, key: stream_source_file(file_path, key, loader),
+            index_file=index_source_keys
+        )
+        print(f"  Lazy loading: indexed {len(file_paths)} source files, {source_data.parsed_file_count} parsed up front")
+        return source_data
+
+    parsed = {}
+    if cache is not None:
+        for file_path in file_paths:
+            if is_stdin(file_path):
+                continue
+            hit, data = cache.get(file_path)
+            if hit:
+                parsed[file_path] = (data, None)
+    to_parse = [file_path for file_path in file_paths if file_path not in parsed]
+    for file_path, result in zip(to_parse, _parse_source_files(to_parse, backend_name, jobs)):
+        parsed[file_path] = result
+        if cache is not None and result[1] is None and not is_stdin(file_path):
+            cache.put(file_path, result[0])
+    if cache is not None:
+        cache.save()
+        print(f"  Source cache: {len(file_paths) - len(to_parse)} reused, {len(to_parse)} parsed ({cache.cache_dir})")
+
     aggregated_data = {}
-    for filename in os.listdir(input_dir):
-        if filename.endswith('.yaml') or filename.endswith('.yml'):
-            file_path = os.path.join(input_dir, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                try:
-                    data = yaml.safe_load(f)
-                    if data:
-                        aggregated_data.update(data)
-                except yaml.YAMLError as e:
-                    print(f"Error parsing YAML file {filename}: {e}")
+    duplicates = 0
+    for file_path in file_paths:
+        data, error = parsed[file_path]
+        if error:
+            print(f"Error parsing source file {os.path.basename(file_path)}: {error}")
+        if data:
+            duplicates += merge_source_data(aggregated_data, data, file_path)
+    if duplicates:
+        print(f"  [WARNING] {duplicates} duplicate entity IDs found across source files.")
+    if entity_filter:
+        aggregated_data, matched, added = entity_filter.apply(aggregated_data)
+        print(f"  Entity filter ({entity_filter.describe()}): {matched} entities matched, {added} kept as references")
+    if sample:
+        aggregated_data, picked, added = sample.apply(aggregated_data)
+        print(f"  Sample ({sample.describe()}): {picked} entities picked, {added} kept as references")
     return aggregated_data
 
-def save_converted_data(output_dir, entity_name, data):
+class _HashingFile:
+    """Write-only binary stream that keeps the SHA-256 of everything written through it to a file."""
+
+    def __init__(self, binary_stream):
+        self.binary_stream = binary_stream
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        return self.binary_stream.write(data)
+
+    def flush(self):
+        self.binary_stream.flush()
+
+def _open_compressed_writer(binary_stream, compression):
+    """Returns a stream that compresses into binary_stream. The output only depends on the data written."""
+    if compression == 'gzip':
+        # No name or time stamp in the header, so the same data gives the same bytes
+        return gzip.GzipFile(filename='', mode='wb', fileobj=binary_stream, mtime=0)
+    if compression == 'xz':
+        return lzma.LZMAFile(binary_stream, mode='wb')
+    raise ValueError(f"Unknown output compression '{compression}'. Expected one of: {', '.join(OUTPUT_COMPRESSIONS)}")
+
+def write_output_file(file_path, write, compression=None):
     """
-    Saves the converted data to a YAML file in the specified output directory.
-    If the file already exists, it merges the new data with the existing data.
+    Writes an output file through write(text_stream) into a temporary file and moves it over
+    file_path only if the content differs from the existing file, so unchanged files keep their
+    mtime and a failed write never leaves a truncated file behind. The text is compressed on the
+    way to the disk with compression ('gzip' or 'xz') if given.
+    Returns (sha256_hex_digest, changed), the digest being that of the file as stored.
     """
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
-    file_path = os.path.join(output_dir, f"{entity_name}.yaml")
+    temp_path = f"{file_path}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            hashed = _HashingFile(f)
+            if compression:
+                with _open_compressed_writer(hashed, compression) as compressed:
+                    write(Utf8TextWriter(compressed))
+            else:
+                write(Utf8TextWriter(hashed))
+        digest = hashed.hash.hexdigest()
+        changed = file_sha256(file_path) != digest
+        if changed:
+            os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return digest, changed
+
+def write_converted_data(output_dir, entity_name, data, dumper='auto', merge=True, output_format='yaml',
+                         compression=None):
+    """
+    Writes the converted data to <entity_name>.<yaml|json|jsonl> (see output_writer.OUTPUT_FORMATS),
+    compressed to <entity_name>.<yaml|json|jsonl>.<gz|xz> if compression is given, in the output
+    directory, merging it with the data of an existing file (unless merge is False, e.g. for shards),
+    and returns (file_path, sha256_hex_digest, changed, contents), contents being the target keys and
+    entity count of the merged file (see output_writer.describe_contents()). The file is only
+    rewritten if its content changes. Runs in write worker processes, so it reports nothing but parse warnings.
+    """
+    file_path = os.path.join(output_dir, output_file_name(f"{entity_name}.yaml", output_format, compression))
+    # entity_name may lead into a sub-directory, e.g. a partition
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
     
     existing_data = {}
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                existing_data = yaml.safe_load(f)
-                if not existing_data: # Handle empty file case
-                    existing_data = {}
-            except yaml.YAMLError as e:
-                print(f"Warning: Error parsing existing YAML file {file_path}: {e}. Overwriting.")
-                existing_data = {}
+    if merge and os.path.exists(file_path):
+        existing_data, error = parse_source_file(file_path)
+        if error:
+            print(f"Warning: Error parsing existing {output_format.upper()} file {file_path}: {error}. Overwriting.")
+        if not isinstance(existing_data, dict): # Handle empty file case
+            existing_data = {}
     
     # Merge new data with existing data
     # Assuming 'data' is a dictionary with a single top-level key (e.g., 'seaf.ta.components.network')
@@ -51,15 +528,136 @@ def save_converted_data(output_dir, entity_name, data):
             existing_data[top_level_key] = {}
         existing_data[top_level_key].update(entities)
 
-    # Dump the merged data to a string and perform placeholder replacement for comments
-    yaml_string = yaml.dump(existing_data, allow_unicode=True, sort_keys=False)
+    # Stream the merged data entity by entity, hashing it on the way
+    digest, changed = write_output_file(
+        file_path, lambda stream: write_converted(stream, existing_data, output_format, dumper), compression
+    )
+    return file_path, digest, changed, describe_contents(existing_data)
 
-    # This is a workaround to add comments, as PyYAML does not support it natively.
-    final_yaml_string = yaml_string.replace(
-        "'###PLACEHOLDER_FOR_MANUAL_ZONE###'",
-        " ### <--- Заполнить вручную"
+def save_converted_data(output_dir, entity_name, data, dumper='auto', merge=True, output_format='yaml',
+                        compression=None):
+    """
+    Saves the converted data to a YAML (or JSON / JSON Lines) file in the specified output directory,
+    compressed with compression ('gzip' or 'xz') if given.
+    If the file already exists, it merges the new data with the existing data (unless merge is False).
+    dumper is the YAML dumper backend (see output_writer.resolve_dumper()).
+    Returns True if the file was written, False if its content did not change.
+    """
+    file_path, _, changed, _ = write_converted_data(
+        output_dir, entity_name, data, dumper, merge, output_format, compression
     )
+    report_saved_file(entity_name, file_path, changed)
+    return changed
+
+def report_saved_file(entity_name, file_path, changed):
+    if changed:
+        print(f"    [SUCCESS] Saved/Merged converted {entity_name} to {file_path}")
+    else:
+        print(f"    [UNCHANGED] Converted {entity_name} is up to date in {file_path}")
+
+def remove_stale_shards(output_dir, file_name, kept_names):
+    """
+    Deletes the files a target file (e.g. 'ru-1a/server.json.gz', relative to output_dir) was written
+    as before that are not in kept_names, the relative names it is written as now: its numbered shards
+    (server.0001.json.gz, ...) and the unsharded file itself. Returns the relative names of the removed files.
+    """
+    relative_dir, name = os.path.split(file_name)
+    base_name = os.path.splitext(strip_compression_suffix(name))[0]
+    pattern = re.compile(re.escape(base_name) + r'(\.\d{4,})?' + re.escape(name[len(base_name):]))
+    directory = os.path.join(output_dir, relative_dir)
+    if not os.path.isdir(directory):
+        return []
+    removed = []
+    for candidate in sorted(os.listdir(directory)):
+        relative_name = f"{relative_dir}/{candidate}" if relative_dir else candidate
+        if pattern.fullmatch(candidate) and relative_name not in kept_names:
+            os.remove(os.path.join(directory, candidate))
+            removed.append(relative_name)
+    return removed
+
+def save_root_yaml(output_dir, file_names):
+    """Writes root.yaml importing the given files, unless it is up to date. Returns (file_path, changed)."""
+    file_path = os.path.join(output_dir, 'root.yaml')
+    _, changed = write_output_file(file_path, lambda stream: stream.write(render_root_yaml(file_names)))
+    return file_path, changed
+
+def save_bundle(output_dir, files, compression=None):
+    """
+    Writes (file_name, data) pairs of all target files to the single bundle file (see
+    output_writer.write_bundle()), unless it is up to date. Returns (file_path, sha256_hex_digest, changed).
+    Index offsets of a compressed bundle refer to the decompressed content.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    file_path = os.path.join(output_dir, BUNDLE_FILE_NAME + OUTPUT_COMPRESSIONS.get(compression, ''))
+    digest, changed = write_output_file(file_path, lambda stream: write_bundle(stream, files), compression)
+    return file_path, digest, changed
+
+def _write_pickled_data(output_dir, entity_name, pickled_data, *args):
+    return write_converted_data(output_dir, entity_name, pickle.loads(pickled_data), *args)
+
+class ConvertedFileWriter:
+    """
+    Serializes and writes converted files in a pool of jobs worker processes. submit() returns at
+    once; wait() blocks until every submitted file is written and reports the results in
+    submission order, so the log does not depend on which worker finishes first. A file submitted
+    again is only handed to the pool once its previous write is done.
+    """
+
+    def __init__(self, output_dir, dumper='auto', jobs=0, output_format='yaml', compression=None):
+        if not jobs or jobs < 0:
+            jobs = os.cpu_count() or 1
+        self.output_dir = output_dir
+        self.dumper = dumper
+        self.output_format = output_format
+        self.compression = compression
+        self.jobs = jobs
+        self._executor = ProcessPoolExecutor(max_workers=jobs)
+        self._submitted = []
+        self._latest = {}
+        # {file_name: sha256_hex_digest} and {file_name: describe_contents()} of the files written
+        # or found up to date, set by wait()
+        self.digests = {}
+        self.contents = {}
+
+    def submit(self, file_name, data, merge=True):
+        """Queues a write of data (merged into an existing file unless merge is False) to file_name."""
+        previous = self._latest.get(file_name)
+        if previous is not None:
+            previous.exception()
+        # The pool pickles arguments in a background thread: snapshot the data before it changes
+        future = self._executor.submit(
+            _write_pickled_data, self.output_dir, self._entity_name(file_name), pickle.dumps(data, pickle.HIGHEST_PROTOCOL),
+            self.dumper, merge, self.output_format, self.compression
+        )
+        self._latest[file_name] = future
+        self._submitted.append((file_name, future))
+
+    @staticmethod
+    def _entity_name(file_name):
+        # server.yaml, server.0001.json.gz -> server, server.0001
+        return os.path.splitext(strip_compression_suffix(file_name))[0]
+
+    def wait(self):
+        """
+        Waits for the submitted writes and returns (written_file_names, unchanged_file_names,
+        failed_file_names). The digests and contents of the files as stored are kept in digests and contents.
+        """
+        written = []
+        unchanged = []
+        failed = []
+        for file_name, future in self._submitted:
+            try:
+                file_path, digest, changed, contents = future.result()
+            except Exception as e:
+                print(f"    [ERROR] Failed to save {file_name}: {e}")
+                failed.append(file_name)
+                continue
+            report_saved_file(self._entity_name(file_name), file_path, changed)
+            self.digests[file_name] = digest
+            self.contents[file_name] = contents
+            (written if changed else unchanged).append(file_name)
+        self._submitted = []
+        return written, unchanged, failed
 
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(final_yaml_string)
-    print(f"    [SUCCESS] Saved/Merged converted {entity_name} to {file_path}")
+    def close(self):
+        self._executor.shutdown()
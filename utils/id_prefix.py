@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+
 _ID_PREFIX = 'tenant'
 
 
@@ -19,19 +21,39 @@ def build_id(*parts: str) -> str:
     return '.'.join([_ID_PREFIX, *cleaned]) if cleaned else _ID_PREFIX
 
 
+def _iter_entity_ids(source_data, key):
+    """Yields the entity IDs of a collection; lazily loaded collections are streamed, not parsed."""
+    if hasattr(source_data, 'iter_entities') and not source_data.is_loaded(key):
+        for entity_id, _ in source_data.iter_entities(key):
+            yield entity_id
+        return
+    entity = source_data[key]
+    if isinstance(entity, dict):
+        yield from entity.keys()
+
+
 def _infer_prefix_from_source(source_data) -> str | None:
-    if not isinstance(source_data, dict):
+    if not isinstance(source_data, Mapping):
         return None
-    for entity in source_data.values():
-        if isinstance(entity, dict):
-            for key in entity.keys():
+    for collection_key in source_data:
+        entity_ids = _iter_entity_ids(source_data, collection_key)
+        try:
+            for key in entity_ids:
                 if isinstance(key, str) and '.' in key:
                     candidate = key.split('.', 1)[0].strip()
                     if candidate and candidate.lower() not in {'seaf', 'metadata'}:
                         return candidate
+        finally:
+            # Stops reading a streamed file at the first usable ID
+            entity_ids.close()
     return None
 
 
+def infer_prefix(source_data) -> str | None:
+    """Return the prefix used by the entity keys of source data, or None if none can be inferred."""
+    return _infer_prefix_from_source(source_data)
+
+
 def ensure_prefix(prefix: str | None = None, source_data=None) -> str:
     """Ensure prefix is set. Override takes precedence; otherwise infer from source data."""
     global _ID_PREFIX
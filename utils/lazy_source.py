@@ -0,0 +1,145 @@
+# utils/lazy_source.py
+
+import re
+from collections.abc import Mapping
+
+from source_merge import merge_source_data, report_duplicate
+
+# Plain top-level keys that a line scan can safely treat as strings
+_PLAIN_KEY_RE = re.compile(r'^([A-Za-z_][\w.\-/]*)\s*:(?:\s|$)')
+_QUOTED_KEY_RE = re.compile(r"""^(?:'([^'\n]*)'|"([^"\\\n]*)")\s*:(?:\s|$)""")
+_NON_STRING_WORDS = {'y', 'n', 'yes', 'no', 'on', 'off', 'true', 'false', 'null'}
+
+def index_yaml_lines(lines):
+    """
+    Returns the top-level mapping keys of a YAML document given as lines, without parsing it.
+    Only unindented 'key:' lines are inspected. Returns None when the text uses a construct the
+    scan cannot interpret (flow style, anchors, complex keys, several documents, ...), in which
+    case the caller has to parse the file to learn its keys.
+    """
+    keys = []
+    documents = 0
+    for line in lines:
+        if not line.strip() or line[0] in ' \t#':
+            continue
+        if line.startswith('---'):
+            documents += 1
+            if documents > 1 or keys:
+                return None
+            continue
+        if line.startswith('...'):
+            continue
+        match = _QUOTED_KEY_RE.match(line)
+        if match:
+            key = match.group(1) if match.group(1) is not None else match.group(2)
+        else:
+            match = _PLAIN_KEY_RE.match(line)
+            if not match or match.group(1).lower() in _NON_STRING_WORDS:
+                return None
+            key = match.group(1)
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+def index_top_level_keys(file_path):
+    """Returns the top-level keys of a YAML file by scanning its lines (see index_yaml_lines)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return index_yaml_lines(f)
+
+
+class LazySourceData(Mapping):
+    """
+    Read-only source_data mapping that parses source files on first access.
+
+    At construction only the top-level keys of every file are indexed with index_file
+    (index_top_level_keys() by default); files that cannot be indexed are parsed right away. A file body is
+    parsed when one of its keys is read, e.g. by source_data.get(...) in a converter. Key order
+    and values are the same as for the eagerly merged dictionary: a collection split across
+    several files is merged with merge_source_data() and duplicate IDs go to on_duplicate.
+    If stream_file is given, iter_entities() reads a collection that has not been parsed yet
+    entity by entity instead of materializing it.
+    """
+
+    def __init__(self, file_paths, parse_file, stream_file=None, index_file=index_top_level_keys,
+                 on_duplicate=report_duplicate):
+        self._parse_file = parse_file
+        self._stream_file = stream_file
+        self._on_duplicate = on_duplicate
+        self._file_data = {}
+        self._merged = {}
+        self._key_files = {}
+        for file_path in file_paths:
+            keys = index_file(file_path)
+            if keys is None:
+                keys = list(self._load_file(file_path).keys())
+            for key in keys:
+                self._key_files.setdefault(key, []).append(file_path)
+
+    def _load_file(self, file_path):
+        if file_path not in self._file_data:
+            data = self._parse_file(file_path)
+            self._file_data[file_path] = data if isinstance(data, dict) else {}
+        return self._file_data[file_path]
+
+    def __getitem__(self, key):
+        if key in self._merged:
+            return self._merged[key]
+        values = []
+        for file_path in self._key_files.get(key, []):
+            data = self._load_file(file_path)
+            if key in data:
+                values.append((file_path, data[key]))
+        if not values:
+            raise KeyError(key)
+        if len(values) == 1:
+            return values[0][1]
+        merged = {}
+        for file_path, value in values:
+            if key not in merged and isinstance(value, dict):
+                value = dict(value)  # keep the per-file data unchanged
+            merge_source_data(merged, {key: value}, file_path, self._on_duplicate)
+        self._merged[key] = merged[key]
+        return merged[key]
+
+    def __contains__(self, key):
+        return key in self._key_files
+
+    def __iter__(self):
+        return iter(self._key_files)
+
+    def __len__(self):
+        return len(self._key_files)
+
+    def iter_entities(self, key):
+        """
+        Yields (entity_id, details) pairs of a collection. Already parsed collections are read
+        from memory, others are streamed from their source files without being kept. IDs repeated
+        across files are reported and yielded again, so the later definition wins in a dict.
+        """
+        if self._stream_file is None or self.is_loaded(key):
+            yield from (self.get(key) or {}).items()
+            return
+        file_paths = self._key_files.get(key, [])
+        seen_ids = set() if len(file_paths) > 1 else None
+        for file_path in file_paths:
+            for entity_id, details in self._stream_file(file_path, key):
+                if seen_ids is not None:
+                    if entity_id in seen_ids:
+                        self._on_duplicate(key, entity_id, file_path)
+                    seen_ids.add(entity_id)
+                yield entity_id, details
+
+    def is_loaded(self, key):
+        """Returns True if the value for key has already been parsed."""
+        file_paths = self._key_files.get(key)
+        return bool(file_paths) and all(file_path in self._file_data for file_path in file_paths)
+
+    @property
+    def parsed_file_count(self):
+        """Number of source files parsed so far."""
+        return len(self._file_data)
+
+    @property
+    def file_count(self):
+        """Number of indexed source files."""
+        return len({file_path for file_paths in self._key_files.values() for file_path in file_paths})
@@ -0,0 +1,19 @@
+# utils/manual_fill.py
+
+# Placeholder of the network segment zone, which has no source field and is filled in by hand
+MANUAL_ZONE_PLACEHOLDER = '###PLACEHOLDER_FOR_MANUAL_ZONE###'
+
+# Default comment written next to fields to be filled in manually
+MANUAL_FILL_COMMENT = 'Заполнить вручную'
+
+class ManualFill(str):
+    """
+    Marks a converted field to be filled in manually. The value is the placeholder text, so it
+    compares equal to it, but the YAML writer emits the field empty with a trailing
+    '### <--- <comment>' comment instead.
+    """
+
+    def __new__(cls, placeholder, comment=MANUAL_FILL_COMMENT):
+        value = super().__new__(cls, placeholder)
+        value.comment = comment
+        return value
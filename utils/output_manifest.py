@@ -0,0 +1,75 @@
+# utils/output_manifest.py
+
+import json
+import os
+
+from file_hash import file_sha256
+from file_io import index_source_keys, is_stdin, write_output_file
+
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+def fingerprint_sources(file_paths, cache=None):
+    """
+    Returns {file_path: {'size', 'sha256', 'collections'}} for the given source files, where
+    collections are the short names of the source collections the file holds (see
+    index_source_keys()), or None if it cannot be indexed and may hold any collection.
+    Hashes the source cache already holds for unchanged files are reused; other files are hashed.
+    Standard input cannot be read again, so it has no size or hash.
+    """
+    sources = {}
+    for file_path in file_paths:
+        file_path = str(file_path)
+        if is_stdin(file_path):
+            sources[file_path] = {'size': None, 'sha256': None, 'collections': None}
+            continue
+        keys = index_source_keys(file_path)
+        sources[file_path] = {
+            'size': os.path.getsize(file_path),
+            'sha256': (cache and cache.known_sha256(file_path)) or file_sha256(file_path),
+            'collections': None if keys is None else sorted({key.split('.')[-1] for key in keys}),
+        }
+    return sources
+
+def manifest_entry(sha256, contents, converters, converter_sources, sources):
+    """
+    Describes one output file: its target keys, entity count and content hash, the converters
+    that contributed to it and the fingerprints of the source files those converters read.
+    sha256 and contents (see output_writer.describe_contents()) describe the file as stored,
+    including entities merged from an existing file.
+    """
+    collections = {name for converter in converters for name in converter_sources.get(converter, ())}
+    inputs = {
+        source_path: source['sha256']
+        for source_path, source in sources.items()
+        if collections and (source['collections'] is None or collections.intersection(source['collections']))
+    }
+    return {
+        'target_keys': contents['target_keys'],
+        'entity_count': contents['entity_count'],
+        'sha256': sha256,
+        'converters': list(converters),
+        'inputs': inputs,
+    }
+
+def render_manifest(entries, sources):
+    """Returns the manifest.json text for {output file name: entry} and the source fingerprints."""
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'files': {file_name: entries[file_name] for file_name in sorted(entries)},
+        'inputs': {
+            source_path: {'size': source['size'], 'sha256': source['sha256']}
+            for source_path, source in sources.items()
+        },
+    }
+    return json.dumps(manifest, ensure_ascii=False, indent=2) + '\n'
+
+def save_manifest(output_dir, entries, sources):
+    """
+    Writes manifest.json next to root.yaml, unless it is up to date, so consumers can compare file
+    hashes with the previous manifest and import only the files that changed.
+    Returns (file_path, changed).
+    """
+    file_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    _, changed = write_output_file(file_path, lambda stream: stream.write(render_manifest(entries, sources)))
+    return file_path, changed
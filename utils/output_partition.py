@@ -0,0 +1,113 @@
+# utils/output_partition.py
+
+import re
+
+from source_filters import dc_name, entity_tenants
+
+# Supported --partition-by values
+PARTITION_KEYS = ('dc', 'tenant', 'az')
+
+# Partition of entities without a single partition value (DCs, regions, entities spanning DCs)
+SHARED_PARTITION = '_shared'
+
+_UNSAFE_NAME_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]')
+
+def partition_dir_name(value):
+    """Returns a partition value as a directory name."""
+    name = _UNSAFE_NAME_CHARACTERS.sub('_', str(value)).strip('.')
+    return name or '_'
+
+def _references(value):
+    values = value if isinstance(value, list) else [value]
+    return [item for item in values if isinstance(item, str) and item]
+
+def _az_name(value):
+    return value.split('.dc_az.', 1)[1] if '.dc_az.' in value else value
+
+class OutputPartitioner:
+    """
+    Assigns converted entities to partitions by DC, availability zone or tenant:
+      - dc: the DCs of the entity 'location' (for network segments 'sber.location');
+      - az: the availability zones of the entity 'az' field, or its DCs, since the converters
+        create one DC per availability zone;
+      - tenant: the tenant of the source entity it was converted from, found by its ID (or an ID
+        it was derived from, e.g. tenant.vpcs.a for tenant.vpcs.a.router) or its external_id.
+    Entities with no or several partition values go to the shared partition.
+    """
+
+    def __init__(self, partition_by, source_data=None):
+        if partition_by not in PARTITION_KEYS:
+            raise ValueError(f"Unknown partition key '{partition_by}'. Expected one of: {', '.join(PARTITION_KEYS)}")
+        self.partition_by = partition_by
+        self._tenants_by_key = {}
+        self._tenants_by_id = {}
+        if partition_by == 'tenant':
+            for entities in (source_data or {}).values():
+                if not isinstance(entities, dict):
+                    continue
+                for entity_id, details in entities.items():
+                    tenants = entity_tenants(details) if isinstance(details, dict) else set()
+                    if not tenants:
+                        continue
+                    self._tenants_by_key[str(entity_id)] = tenants
+                    if details.get('id') is not None:
+                        self._tenants_by_id[str(details['id'])] = tenants
+
+    def _locations(self, entity):
+        locations = _references(entity.get('location'))
+        if not locations and isinstance(entity.get('sber'), dict):
+            locations = _references(entity['sber'].get('location'))
+        return {dc_name(location) for location in locations}
+
+    def _tenants(self, entity_id, entity):
+        parts = str(entity_id).split('.')
+        for end in range(len(parts), 0, -1):
+            tenants = self._tenants_by_key.get('.'.join(parts[:end]))
+            if tenants:
+                return tenants
+        return self._tenants_by_id.get(str(entity.get('external_id')), set())
+
+    def partitions(self, entity_id, entity):
+        """Returns the partition values of a converted entity."""
+        if not isinstance(entity, dict):
+            return set()
+        if self.partition_by == 'dc':
+            return self._locations(entity)
+        if self.partition_by == 'az':
+            return {_az_name(az) for az in _references(entity.get('az'))} or self._locations(entity)
+        return self._tenants(entity_id, entity)
+
+    def partition(self, entity_id, entity):
+        """Returns the directory name of the partition an entity is written to."""
+        values = self.partitions(entity_id, entity)
+        return partition_dir_name(next(iter(values))) if len(values) == 1 else SHARED_PARTITION
+
+    def split(self, data):
+        """
+        Splits the {target_key: {entity_id: entity}} data of one target file into (partition, data)
+        pairs in partition name order, keeping the entity order within each partition.
+        """
+        partitions = {}
+        for target_key, entities in data.items():
+            if not isinstance(entities, dict):
+                partitions.setdefault(SHARED_PARTITION, {})[target_key] = entities
+                continue
+            for entity_id, entity in entities.items():
+                partition_data = partitions.setdefault(self.partition(entity_id, entity), {})
+                partition_data.setdefault(target_key, {})[entity_id] = entity
+        return sorted(partitions.items())
+
+def partition_imports(file_names):
+    """
+    Groups '<partition>/<file>' names by partition into the imports of each partition's root.yaml:
+    its own files followed by the files of the shared partition, which its entities reference.
+    """
+    files = {}
+    for file_name in file_names:
+        partition, _, name = file_name.partition('/')
+        files.setdefault(partition, []).append(name)
+    shared = [f"../{SHARED_PARTITION}/{name}" for name in files.get(SHARED_PARTITION, [])]
+    return {
+        partition: names + (shared if partition != SHARED_PARTITION else [])
+        for partition, names in sorted(files.items())
+    }
@@ -0,0 +1,514 @@
+# utils/output_writer.py
+
+import io
+import json
+import os
+import tarfile
+import tempfile
+import datetime
+import re
+import yaml
+from yaml.events import (
+    StreamStartEvent, StreamEndEvent, DocumentStartEvent, DocumentEndEvent, AliasEvent, ScalarEvent,
+    SequenceStartEvent, SequenceEndEvent, MappingStartEvent, MappingEndEvent
+)
+from yaml.nodes import ScalarNode, SequenceNode, MappingNode
+from yaml.resolver import BaseResolver
+from yaml.serializer import Serializer
+
+from manual_fill import ManualFill
+
+DEFAULT_MAPPING_TAG = BaseResolver.DEFAULT_MAPPING_TAG
+
+try:
+    from yaml import CSafeDumper
+except ImportError:  # PyYAML built without LibYAML
+    CSafeDumper = None
+
+# Output path that stands for standard output
+STDOUT_PATH = '-'
+
+# Formats of the converted bundle written to standard output
+STREAM_FORMATS = ('yaml', 'tar')
+
+# Formats of converted files: one file per target in YAML, JSON or JSON Lines, or a single
+# bundle file with all targets
+OUTPUT_FORMATS = ('yaml', 'json', 'jsonl', 'bundle')
+
+# Extension of the per-target files of each output format
+OUTPUT_EXTENSIONS = {'yaml': '.yaml', 'json': '.json', 'jsonl': '.jsonl'}
+
+# Compressions of converted files and the suffix they add to file names (root.yaml is never compressed)
+OUTPUT_COMPRESSIONS = {'gzip': '.gz', 'xz': '.xz'}
+
+# Name of the single output file of the 'bundle' format
+BUNDLE_FILE_NAME = 'bundle.jsonl'
+
+# Key of the bundle header line holding the index of the sections that follow it
+BUNDLE_INDEX_FIELD = '__bundle_index__'
+
+# JSON Lines header record that declares the collection key of the records following it
+# (read from source files by file_io, written to converted files by write_converted_jsonl())
+JSONL_COLLECTION_FIELD = '__collection__'
+
+# YAML dumper backends for converted files
+DUMPER_BACKENDS = ('auto', 'libyaml', 'python')
+
+# Scalar types that yaml.Dumper and yaml.CSafeDumper represent the same way
+_PLAIN_SCALAR_TYPES = (str, int, float, bool, type(None), datetime.date, datetime.datetime)
+
+# Characters the Python emitter only writes escaped in double quotes (with allow_unicode=True):
+# anything but line feeds and printable BMP characters, plus the Unicode line/paragraph separators and BOM
+# Longest mapping key LibYAML writes as a simple 'key: value' key is one byte shorter than this
+_SIMPLE_KEY_MAX_BYTES = 128
+_UNSAFE_CHARACTERS = re.compile('[^\n\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd]')
+
+def is_stdout(path):
+    """Returns True if an output path stands for standard output."""
+    return str(path) == STDOUT_PATH
+
+def resolve_dumper(backend='auto'):
+    """
+    Resolves a YAML dumper backend name to a (backend_name, dumper_class) pair.
+    'libyaml' uses yaml.CSafeDumper, 'python' uses ConvertedYamlDumper (yaml.Dumper, the
+    yaml.dump() default, that writes ManualFill comments).
+    If LibYAML is not available, the pure-Python dumper is returned instead.
+    """
+    if backend not in DUMPER_BACKENDS:
+        raise ValueError(f"Unknown YAML dumper backend '{backend}'. Expected one of: {', '.join(DUMPER_BACKENDS)}")
+    if backend == 'python':
+        return 'python', ConvertedYamlDumper
+    if CSafeDumper is None:
+        if backend == 'libyaml':
+            print("[WARNING] LibYAML is not available. Falling back to the pure-Python YAML dumper.")
+        return 'python', ConvertedYamlDumper
+    return 'libyaml', CSafeDumper
+
+def _is_emitter_safe_string(value, is_key=False):
+    """
+    Returns True if the LibYAML emitter writes a string exactly like the Python emitter.
+    They differ on double-quoted scalars (line wrapping and escapes), so strings the Python emitter
+    double-quotes are rejected: characters outside the printable BMP range, NEL and the Unicode
+    line/paragraph separators and BOM, a space next to a line break, and multi-line mapping keys.
+    Both write keys shorter than 128 as simple keys, but LibYAML counts UTF-8 bytes and the Python
+    emitter characters, so keys of 128 bytes or more (e.g. 64 Cyrillic characters) are rejected.
+    The Python emitter also writes an empty key as a complex key ("? ''"), so it is rejected too.
+    """
+    if _UNSAFE_CHARACTERS.search(value):
+        return False
+    if is_key and (value == '' or len(value.encode('utf-8')) >= _SIMPLE_KEY_MAX_BYTES):
+        return False
+    if '\n' in value and (is_key or ' \n' in value or '\n ' in value):
+        return False
+    return True
+
+def is_libyaml_safe(data):
+    """
+    Returns True if yaml.CSafeDumper dumps data byte for byte like yaml.Dumper: the data holds only
+    dicts, lists and plain scalars (no ManualFill values, whose comments only the Python emitter
+    writes), and every string passes _is_emitter_safe_string().
+    """
+    stack = [(data, False)]
+    while stack:
+        value, is_key = stack.pop()
+        value_type = type(value)
+        if value_type is dict:
+            for key, item in value.items():
+                stack.append((key, True))
+                stack.append((item, False))
+        elif value_type is list:
+            stack.extend((item, False) for item in value)
+        elif value_type is str:
+            if not _is_emitter_safe_string(value, is_key):
+                return False
+        elif value_type not in _PLAIN_SCALAR_TYPES:
+            return False
+    return True
+
+class ConvertedYamlDumper(yaml.Dumper):
+    """
+    yaml.Dumper that writes ManualFill values as an empty value followed by a
+    '### <--- <comment>' comment, e.g. 'zone:  ### <--- Заполнить вручную'.
+    """
+
+    def process_scalar(self):
+        value = self.event.value
+        if isinstance(value, ManualFill) and not self.simple_key_context:
+            self.write_indicator(f" ### <--- {value.comment}", True)
+            self.analysis = None
+            self.style = None
+            return
+        super().process_scalar()
+
+ConvertedYamlDumper.add_representer(
+    ManualFill, lambda dumper, data: dumper.represent_scalar('tag:yaml.org,2002:str', data)
+)
+
+class _EntityStreamer:
+    """
+    Emits a {top_level_key: {entity_id: entity}} document through a dumper one entity at a time.
+    Each entity is represented and serialized on its own, with the events, anchors and implicit
+    tags yaml.serializer.Serializer produces for the whole document, so the output is the same as
+    yaml.dump() while only one entity's node tree is in memory.
+    """
+
+    def __init__(self, dumper):
+        self.dumper = dumper
+        self.last_anchor_id = 0
+        self.anchors = {}
+        self.serialized_nodes = set()
+
+    def emit_document(self, data):
+        dumper = self.dumper
+        dumper.emit(StreamStartEvent())
+        dumper.emit(DocumentStartEvent(explicit=False))
+        dumper.emit(MappingStartEvent(None, DEFAULT_MAPPING_TAG, True, flow_style=False))
+        for top_level_key, entities in data.items():
+            self.emit_nodes(top_level_key)
+            dumper.emit(MappingStartEvent(None, DEFAULT_MAPPING_TAG, True, flow_style=False))
+            for entity_id, entity in entities.items():
+                self.emit_nodes(entity_id, entity)
+            dumper.emit(MappingEndEvent())
+        dumper.emit(MappingEndEvent())
+        dumper.emit(DocumentEndEvent(explicit=False))
+        dumper.emit(StreamEndEvent())
+
+    def emit_nodes(self, *values):
+        dumper = self.dumper
+        nodes = [dumper.represent_data(value) for value in values]
+        # Objects shared between entities were ruled out, so the representer can start afresh
+        dumper.represented_objects = {}
+        dumper.object_keeper = []
+        dumper.alias_key = None
+        self.anchors = {}
+        self.serialized_nodes = set()
+        for node in nodes:
+            self.anchor_node(node)
+        for node in nodes:
+            self.serialize_node(node)
+
+    def anchor_node(self, node):
+        if node in self.anchors:
+            if self.anchors[node] is None:
+                self.last_anchor_id += 1
+                self.anchors[node] = Serializer.ANCHOR_TEMPLATE % self.last_anchor_id
+            return
+        self.anchors[node] = None
+        if isinstance(node, SequenceNode):
+            for item in node.value:
+                self.anchor_node(item)
+        elif isinstance(node, MappingNode):
+            for key, value in node.value:
+                self.anchor_node(key)
+                self.anchor_node(value)
+
+    def serialize_node(self, node):
+        dumper = self.dumper
+        alias = self.anchors[node]
+        if node in self.serialized_nodes:
+            dumper.emit(AliasEvent(alias))
+            return
+        self.serialized_nodes.add(node)
+        if isinstance(node, ScalarNode):
+            detected_tag = dumper.resolve(ScalarNode, node.value, (True, False))
+            default_tag = dumper.resolve(ScalarNode, node.value, (False, True))
+            implicit = (node.tag == detected_tag), (node.tag == default_tag)
+            dumper.emit(ScalarEvent(alias, node.tag, implicit, node.value, style=node.style))
+        elif isinstance(node, SequenceNode):
+            implicit = node.tag == dumper.resolve(SequenceNode, node.value, True)
+            dumper.emit(SequenceStartEvent(alias, node.tag, implicit, flow_style=node.flow_style))
+            for item in node.value:
+                self.serialize_node(item)
+            dumper.emit(SequenceEndEvent())
+        else:
+            implicit = node.tag == dumper.resolve(MappingNode, node.value, True)
+            dumper.emit(MappingStartEvent(alias, node.tag, implicit, flow_style=node.flow_style))
+            for key, value in node.value:
+                self.serialize_node(key)
+                self.serialize_node(value)
+            dumper.emit(MappingEndEvent())
+
+def _is_streamable(data, dumper):
+    """
+    Returns True if data is a {top_level_key: {entity_id: entity}} mapping with no object (other than
+    scalars the dumper never aliases) shared between entities, which yaml.dump() would write as an
+    alias of an anchor in an earlier entity.
+    """
+    if type(data) is not dict or not data or any(type(entities) is not dict for entities in data.values()):
+        return False
+    owners = {}
+    for owner, entity in enumerate(entity for entities in data.values() for entity in entities.values()):
+        stack = [entity]
+        while stack:
+            value = stack.pop()
+            if dumper.ignore_aliases(value):
+                continue
+            if owners.setdefault(id(value), owner) != owner:
+                return False
+            if type(value) is dict:
+                stack.extend(value.keys())
+                stack.extend(value.values())
+            elif type(value) is list:
+                stack.extend(value)
+    return True
+
+def write_converted_yaml(stream, data, dumper='auto'):
+    """
+    Writes converted data as YAML to a text stream, with ManualFill values as comments.
+    Entities are represented and emitted one at a time (see _EntityStreamer), so memory use does not
+    grow with the size of the output; data that cannot be streamed that way is dumped at once.
+    With the 'libyaml' dumper (the 'auto' default when LibYAML is available) the C emitter is used
+    for data it writes exactly like the Python emitter (see is_libyaml_safe()), so the output
+    does not depend on the backend.
+    """
+    _, dumper_class = resolve_dumper(dumper)
+    if dumper_class is not ConvertedYamlDumper and not is_libyaml_safe(data):
+        dumper_class = ConvertedYamlDumper
+    yaml_dumper = dumper_class(stream, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    try:
+        if _is_streamable(data, yaml_dumper):
+            _EntityStreamer(yaml_dumper).emit_document(data)
+        else:
+            yaml_dumper.open()
+            yaml_dumper.represent(data)
+            yaml_dumper.close()
+    finally:
+        yaml_dumper.dispose()
+
+def _without_manual_fill(value):
+    if isinstance(value, ManualFill):
+        return None
+    if isinstance(value, dict):
+        return {key: _without_manual_fill(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_without_manual_fill(item) for item in value]
+    return value
+
+def to_json(value):
+    """
+    Serializes converted data as compact JSON text. Fields to be filled in manually (ManualFill)
+    are written as null, like the empty value the YAML writer emits for them; dates and other
+    values JSON has no type for are written as strings.
+    """
+    return json.dumps(_without_manual_fill(value), ensure_ascii=False, default=str)
+
+def write_converted_json(stream, data):
+    """
+    Writes converted data to a text stream as one JSON document, followed by a line break. Entities
+    are serialized one at a time; the text is the same as to_json(data).
+    """
+    stream.write('{')
+    for key_index, (target_key, entities) in enumerate(data.items()):
+        if key_index:
+            stream.write(', ')
+        stream.write(f"{to_json(target_key)}: ")
+        if not isinstance(entities, dict):
+            stream.write(to_json(entities))
+            continue
+        stream.write('{')
+        for entity_index, (entity_id, entity) in enumerate(entities.items()):
+            if entity_index:
+                stream.write(', ')
+            stream.write(f"{to_json(entity_id)}: {to_json(entity)}")
+        stream.write('}')
+    stream.write('}\n')
+
+def write_converted_jsonl(stream, data):
+    """
+    Writes converted data to a text stream as JSON Lines: a {"__collection__": target_key} header
+    line per target key followed by one {entity_id: entity} line per entity, the layout
+    file_io reads JSON Lines source files in.
+    """
+    for target_key, entities in data.items():
+        stream.write(f"{to_json({JSONL_COLLECTION_FIELD: target_key})}\n")
+        for entity_id, entity in entities.items():
+            stream.write(f"{to_json({entity_id: entity})}\n")
+
+def write_converted(stream, data, output_format='yaml', dumper='auto'):
+    """Writes the converted data of one target file to a text stream in a per-file output format."""
+    if output_format == 'json':
+        write_converted_json(stream, data)
+    elif output_format == 'jsonl':
+        write_converted_jsonl(stream, data)
+    else:
+        write_converted_yaml(stream, data, dumper)
+
+def output_file_name(file_name, output_format='yaml', compression=None):
+    """
+    Returns the name a target file (e.g. server.yaml) is written under in a per-file output format,
+    with the suffix of the compression if any (e.g. server.json.gz).
+    """
+    return os.path.splitext(file_name)[0] + OUTPUT_EXTENSIONS[output_format] + OUTPUT_COMPRESSIONS.get(compression, '')
+
+class Utf8TextWriter:
+    """Write-only text stream over a binary stream that writes UTF-8."""
+
+    # The C emitter writes text (not bytes) to streams that have an encoding attribute
+    encoding = 'utf-8'
+
+    def __init__(self, binary_stream):
+        self.binary_stream = binary_stream
+
+    def write(self, text):
+        self.binary_stream.write(text.encode('utf-8'))
+
+    def flush(self):
+        pass
+
+def describe_contents(data):
+    """Returns the 'target_keys' and 'entity_count' of the {target_key: {entity_id: entity}} data of a file."""
+    return {
+        'target_keys': list(data),
+        'entity_count': sum(len(entities) for entities in data.values() if isinstance(entities, dict)),
+    }
+
+def write_bundle(stream, files):
+    """
+    Writes (file_name, data) pairs of target files to a text stream as one bundle: a header line
+    {"__bundle_index__": [...]} followed by one JSON line per file (see write_converted_json()).
+    Each index entry gives the file 'name' (e.g. 'server'), its 'target_keys', 'entity_count', and
+    the 'offset' and 'length' in bytes of its line, counted from the end of the header line, so a
+    reader can seek to a single target without parsing the others.
+    """
+    index = []
+    # Sections go to a temporary file first, as the header with their offsets is written before them
+    with tempfile.TemporaryFile() as sections:
+        section_stream = Utf8TextWriter(sections)
+        for file_name, data in files:
+            offset = sections.tell()
+            write_converted_json(section_stream, data)
+            index.append({
+                'name': os.path.splitext(file_name)[0],
+                **describe_contents(data),
+                'offset': offset,
+                'length': sections.tell() - offset,
+            })
+        stream.write(f"{to_json({BUNDLE_INDEX_FIELD: index})}\n")
+        sections.seek(0)
+        text = io.TextIOWrapper(sections, encoding='utf-8')
+        for chunk in iter(lambda: text.read(1024 * 1024), ''):
+            stream.write(chunk)
+        text.detach()
+
+def render_converted_yaml(data, dumper='auto'):
+    """Dumps converted data to YAML text, with ManualFill values as comments."""
+    stream = io.StringIO()
+    write_converted_yaml(stream, data, dumper)
+    return stream.getvalue()
+
+def shard_file_name(file_name, index):
+    """Returns the name of shard index (1-based) of a target file, e.g. server.0001.yaml."""
+    base_name, extension = os.path.splitext(file_name)
+    return f"{base_name}.{index:04d}{extension}"
+
+def split_into_shards(file_name, data, max_entities=None):
+    """
+    Splits the {target_key: {entity_id: entity}} data of a target file into numbered shards of at most
+    max_entities entities each, in entity order. Each shard is a {target_key: {...}} document of its own.
+    Returns [(file_name, data)] pairs: the file itself if it is small enough or max_entities is not set.
+    """
+    if not max_entities or sum(len(entities) for entities in data.values()) <= max_entities:
+        return [(file_name, data)]
+    shards = []
+    shard = {}
+    shard_size = 0
+    for target_key, entities in data.items():
+        for entity_id, entity in entities.items():
+            if shard_size == max_entities:
+                shards.append(shard)
+                shard = {}
+                shard_size = 0
+            shard.setdefault(target_key, {})[entity_id] = entity
+            shard_size += 1
+    shards.append(shard)
+    return [(shard_file_name(file_name, index), shard) for index, shard in enumerate(shards, start=1)]
+
+# Extensions of the converted files SEAF root.yaml imports can load (a JSON document is valid YAML)
+ROOT_IMPORT_EXTENSIONS = ('.yaml', '.json')
+
+def root_importable_files(file_names):
+    """
+    Returns the file names root.yaml can import: uncompressed YAML and JSON files. JSON Lines and
+    compressed files cannot be loaded by SEAF root imports.
+    """
+    return [file_name for file_name in file_names if os.path.splitext(file_name)[1] in ROOT_IMPORT_EXTENSIONS]
+
+def render_root_yaml(file_names):
+    """Returns the root.yaml text importing the given files (sorted, without duplicates)."""
+    return yaml.dump({'imports': sorted(set(file_names))}, allow_unicode=True, sort_keys=False)
+
+def report_conflict(target_key, entity_id, origin, previous_origin):
+    """Prints a warning about an entity ID that two converters produced with different content."""
+    print(f"    [WARNING] Conflicting entity '{entity_id}' in '{target_key}': "
+          f"{origin or 'unknown'} replaces the definition from {previous_origin or 'unknown'}.")
+
+class ConvertedOutput:
+    """
+    In-memory accumulator of converted target files, so each file is serialized once no matter
+    how many converters contribute to it. Data added to the same file is merged in the order it
+    is added, the way save_converted_data() merges it into an existing file. An entity ID added
+    again with different content is reported through on_conflict and the later definition is kept.
+    contributors lists the origins of the data of each file in the order they were first added.
+    """
+
+    def __init__(self, on_conflict=report_conflict):
+        self.files = {}
+        self.contributors = {}
+        self.conflicts = 0
+        self._origins = {}
+        self._on_conflict = on_conflict
+
+    def add(self, entity_name, data, origin=None):
+        """
+        Merges {target_key: {entity_id: entity}} data into the file <entity_name>.yaml.
+        origin names the contributor (e.g. the converter) in conflict reports.
+        """
+        file_data = self.files.setdefault(f"{entity_name}.yaml", {})
+        contributors = self.contributors.setdefault(f"{entity_name}.yaml", [])
+        if origin is not None and origin not in contributors:
+            contributors.append(origin)
+        for top_level_key, entities in data.items():
+            if top_level_key not in file_data:
+                file_data[top_level_key] = {}
+            target_entities = file_data[top_level_key]
+            for entity_id, entity in entities.items():
+                if entity_id in target_entities and target_entities[entity_id] != entity:
+                    self.conflicts += 1
+                    self._on_conflict(top_level_key, entity_id, origin, self._origins.get((top_level_key, entity_id)))
+                target_entities[entity_id] = entity
+                self._origins[(top_level_key, entity_id)] = origin
+
+    def rendered_files(self, dumper='auto', max_entities=None):
+        """
+        Returns (file_name, yaml_text) pairs of all files followed by root.yaml, in file name order.
+        Files with more than max_entities entities are split into shards (see split_into_shards()).
+        """
+        rendered = [
+            (shard_name, render_converted_yaml(shard_data, dumper))
+            for file_name in sorted(self.files)
+            for shard_name, shard_data in split_into_shards(file_name, self.files[file_name], max_entities)
+        ]
+        if rendered:
+            rendered.append(('root.yaml', render_root_yaml(name for name, _ in rendered)))
+        return rendered
+
+def write_yaml_bundle(stream, rendered_files):
+    """
+    Writes files as one multi-document YAML stream: each file is a document that starts with
+    a '--- # <file name>' line.
+    """
+    for file_name, text in rendered_files:
+        stream.write(f"--- # {file_name}\n")
+        stream.write(text)
+    stream.flush()
+
+def write_tar_stream(binary_stream, rendered_files):
+    """Writes files as an uncompressed tar stream, one member per file."""
+    with tarfile.open(fileobj=binary_stream, mode='w|', format=tarfile.PAX_FORMAT) as archive:
+        for file_name, text in rendered_files:
+            content = text.encode('utf-8')
+            member = tarfile.TarInfo(file_name)
+            member.size = len(content)
+            member.mode = 0o644
+            archive.addfile(member, io.BytesIO(content))
+    binary_stream.flush()
@@ -0,0 +1,179 @@
+# utils/pipeline.py
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from file_io import parse_source_file, index_source_keys, is_stdin
+from source_merge import merge_source_data
+from id_prefix import ensure_prefix, infer_prefix
+
+# Default capacity of the queues between the pipeline stages
+DEFAULT_QUEUE_SIZE = 4
+
+def _short_name(collection_key):
+    return collection_key.split('.')[-1]
+
+class _CollectionTracker:
+    """
+    Tracks which source collections are complete while files are merged in order.
+    A collection is complete once every file listing it in the index has been merged; files that
+    cannot be indexed may hold any collection, so nothing is complete before they are merged.
+    """
+
+    def __init__(self, file_keys):
+        self.remaining = {}
+        self.unindexed = 0
+        for keys in file_keys.values():
+            if keys is None:
+                self.unindexed += 1
+                continue
+            for name in {_short_name(key) for key in keys}:
+                self.remaining[name] = self.remaining.get(name, 0) + 1
+
+    def file_merged(self, keys):
+        if keys is None:
+            self.unindexed -= 1
+            return
+        for name in {_short_name(key) for key in keys}:
+            self.remaining[name] -= 1
+
+    def complete(self, source_names):
+        return self.unindexed == 0 and all(not self.remaining.get(name) for name in source_names)
+
+async def _read_stage(file_paths, backend, cache, executor, read_ahead, loaded_queue):
+    """Parses files in the executor, at most read_ahead at a time, and queues them in file order."""
+    loop = asyncio.get_running_loop()
+    in_flight = []
+
+    def submit(file_path):
+        if is_stdin(file_path):
+            # Standard input belongs to this process: parse it in a thread, bypassing the cache
+            return file_path, loop.run_in_executor(None, parse_source_file, file_path, backend), False
+        if cache is not None:
+            hit, data = cache.get(file_path)
+            if hit:
+                future = loop.create_future()
+                future.set_result((data, None))
+                return file_path, future, False
+        return file_path, loop.run_in_executor(executor, parse_source_file, file_path, backend), True
+
+    pending = list(file_paths)
+    while pending or in_flight:
+        while pending and len(in_flight) < read_ahead:
+            in_flight.append(submit(pending.pop(0)))
+        file_path, future, cacheable = in_flight.pop(0)
+        data, error = await future
+        if cache is not None and cacheable and error is None:
+            cache.put(file_path, data)
+        await loaded_queue.put((file_path, data, error))
+    await loaded_queue.put(None)
+
+async def _convert_stage(file_keys, tasks, convert, id_prefix, loaded_queue, converted_queue, source_data):
+    """
+    Merges loaded files into source_data and runs each converter as soon as the source collections
+    it reads are complete, queueing (task_index, name, result) for the write stage.
+    Converters run in the event loop thread, so they never see a collection that is still growing.
+    """
+    tracker = _CollectionTracker(file_keys)
+    waiting = list(enumerate(tasks))
+    files_left = len(file_keys)
+
+    async def run_ready():
+        # Generated IDs depend on the prefix, so nothing is converted before it is known
+        if not (id_prefix or files_left == 0 or infer_prefix(source_data)):
+            return
+        ensure_prefix(prefix=id_prefix, source_data=source_data)
+        for task in list(waiting):
+            index, (name, source_names) = task
+            if files_left == 0 or tracker.complete(source_names):
+                waiting.remove(task)
+                await converted_queue.put((index, name, convert(name, source_data)))
+                # Let the read and write stages make progress between converters
+                await asyncio.sleep(0)
+
+    while True:
+        item = await loaded_queue.get()
+        if item is None:
+            break
+        file_path, data, error = item
+        if error:
+            print(f"Error parsing source file {os.path.basename(file_path)}: {error}")
+        if isinstance(data, dict):
+            merge_source_data(source_data, data, file_path)
+        files_left -= 1
+        tracker.file_merged(file_keys[file_path])
+        await run_ready()
+    files_left = 0
+    await run_ready()
+    await converted_queue.put(None)
+
+async def _write_stage(collect, finish, executor, converted_queue):
+    """
+    Hands converter results to collect() in task order and runs the write jobs it returns in the
+    executor, while later converters are still running. The jobs returned by finish() run last.
+    """
+    loop = asyncio.get_running_loop()
+    buffered = {}
+    next_index = 0
+    writes = []
+    while True:
+        item = await converted_queue.get()
+        if item is None:
+            break
+        index, name, result = item
+        buffered[index] = (name, result)
+        while next_index in buffered:
+            name, result = buffered.pop(next_index)
+            writes.extend(loop.run_in_executor(executor, job) for job in collect(name, result))
+            next_index += 1
+    writes.extend(loop.run_in_executor(executor, job) for job in finish())
+    await asyncio.gather(*writes)
+
+async def _run_pipeline(file_paths, tasks, convert, collect, finish, backend, jobs, cache, id_prefix, queue_size):
+    loop = asyncio.get_running_loop()
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
+    file_keys = {}
+    for file_path in file_paths:
+        file_keys[file_path] = await loop.run_in_executor(None, index_source_keys, file_path)
+
+    source_data = {}
+    loaded_queue = asyncio.Queue(maxsize=queue_size)
+    converted_queue = asyncio.Queue(maxsize=queue_size)
+    read_executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else ThreadPoolExecutor(max_workers=1)
+    # A single writer thread runs the write jobs in the order they were returned
+    write_executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        await asyncio.gather(
+            _read_stage(file_paths, backend, cache, read_executor, max(jobs, 1) + queue_size, loaded_queue),
+            _convert_stage(file_keys, tasks, convert, id_prefix, loaded_queue, converted_queue, source_data),
+            _write_stage(collect, finish, write_executor, converted_queue),
+        )
+    finally:
+        read_executor.shutdown()
+        write_executor.shutdown()
+        if cache is not None:
+            cache.save()
+    return source_data
+
+def run_pipeline(file_paths, tasks, convert, collect, finish=list, backend='auto', jobs=1, cache=None, id_prefix=None,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Loads source files, converts and writes in three overlapping asyncio stages connected by
+    bounded queues of queue_size items:
+      1. read: files are parsed in an executor (a process pool with jobs > 1) a few files ahead,
+         going through the SourceCache if one is given;
+      2. convert: files are merged in order and each task runs once the source collections it
+         reads are complete (see index_source_keys());
+      3. write: results are collected in task order and finished files are written in a
+         background thread.
+    tasks is a list of (name, source_collection_names) pairs, where the names are the short
+    collection names (e.g. 'ecss'). convert(name, source_data) returns a result that is passed to
+    collect(name, result), which returns the write jobs (callables without arguments) that can run
+    now; finish() returns the remaining write jobs once every task has run. Returns the merged
+    source data.
+    """
+    return asyncio.run(_run_pipeline(
+        file_paths, tasks, convert, collect, finish, backend, jobs, cache, id_prefix, queue_size
+    ))
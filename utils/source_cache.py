@@ -0,0 +1,182 @@
+# utils/source_cache.py
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from file_hash import file_sha256
+
+CACHE_VERSION = 1
+INDEX_FILE_NAME = 'index.json'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def default_cache_dir():
+    """Returns the default cache location (XDG_CACHE_HOME or ~/.cache)."""
+    base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, 'adv_reverse2seaf', 'source')
+
+def file_fingerprint(file_path):
+    """Returns the path, size, mtime and content hash that identify a source file."""
+    stat = os.stat(file_path)
+    return {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(file_path),
+    }
+
+
+class SourceCache:
+    """
+    On-disk cache of parsed source files.
+
+    Each parsed file is pickled into its own entry file. The index maps the absolute source path
+    to its size, mtime and content hash: when size and mtime are unchanged the entry is reused
+    without reading the source, otherwise the content hash decides. The total size of the entry
+    files is bounded by max_bytes; least recently used entries are evicted first on save().
+    The cache directory is created here, so an unusable location raises OSError. Once writing an
+    entry or the index fails (e.g. on a full disk), a warning is printed and nothing more is
+    written, so loading continues without the cache.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = str(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = {}
+        self.write_failed = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._read_index()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE_NAME)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != CACHE_VERSION:
+            return {}
+        return index.get('entries', {})
+
+    def _entry_path(self, entry):
+        return os.path.join(self.cache_dir, entry['file'])
+
+    def get(self, file_path):
+        """Returns (True, data) for an up-to-date cached file, (False, None) otherwise."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        entry = self._index.get(path)
+        if entry and (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            sha256 = file_sha256(path)
+            self._fingerprints[path] = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+            if entry['sha256'] != sha256:
+                entry = None
+            else:
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        if entry:
+            try:
+                with open(self._entry_path(entry), 'rb') as f:
+                    data = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                self._index.pop(path, None)
+            else:
+                entry['last_used'] = time.time()
+                self.hits += 1
+                return True, data
+        # Fingerprint before the caller parses the file, so a concurrent edit is not cached as current
+        if path not in self._fingerprints:
+            self._fingerprints[path] = file_fingerprint(path)
+        self.misses += 1
+        return False, None
+
+    def known_sha256(self, file_path):
+        """
+        Returns the content hash of a source file if it was computed by this run or is in the index
+        and the file's size and mtime did not change since, None otherwise. Does not read the file.
+        """
+        path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        for record in (self._fingerprints.get(path), self._index.get(path)):
+            if record and (record['size'], record['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+                return record['sha256']
+        return None
+
+    def _report_write_failure(self, error):
+        if not self.write_failed:
+            print(f"[WARNING] Cannot write the source cache in {self.cache_dir}: {error}. Continuing without caching.")
+        self.write_failed = True
+
+    def put(self, file_path, data):
+        """Stores parsed data for a source file."""
+        path = os.path.abspath(file_path)
+        fingerprint = self._fingerprints.pop(path, None) or file_fingerprint(path)
+        if self.write_failed:
+            return
+        entry_file = hashlib.sha256(f"{path}\0{fingerprint['sha256']}".encode('utf-8')).hexdigest() + '.pickle'
+        entry_path = os.path.join(self.cache_dir, entry_file)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+            entry_bytes = os.path.getsize(entry_path)
+        except OSError as e:
+            self._remove_file(tmp_path)
+            self._report_write_failure(e)
+            return
+
+        previous = self._index.get(path)
+        if previous and previous['file'] != entry_file:
+            self._remove_entry_file(previous)
+        self._index[path] = {
+            'file': entry_file,
+            'size': fingerprint['size'],
+            'mtime_ns': fingerprint['mtime_ns'],
+            'sha256': fingerprint['sha256'],
+            'bytes': entry_bytes,
+            'last_used': time.time(),
+        }
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove_entry_file(self, entry):
+        self._remove_file(self._entry_path(entry))
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits into max_bytes."""
+        total_bytes = sum(entry['bytes'] for entry in self._index.values())
+        for path, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove_entry_file(entry)
+            del self._index[path]
+            total_bytes -= entry['bytes']
+
+    def save(self):
+        """Applies LRU eviction and writes the index to disk."""
+        self.evict()
+        if self.write_failed:
+            return
+        index_path = self._index_path()
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'entries': self._index}, f)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            self._remove_file(tmp_path)
+            self._report_write_failure(e)
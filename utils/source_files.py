@@ -0,0 +1,78 @@
+# utils/source_files.py
+
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+
+# Single-file compression suffixes and the functions that open them as a decompressing stream
+COMPRESSION_OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.bz2': bz2.open,
+}
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz', '.tar.bz2', '.tbz2')
+
+# Buffer size of source streams; format detection peeks at most this many bytes
+SNIFF_BYTES = 1024 * 1024
+
+class _ForwardReader(io.RawIOBase):
+    """Read-only, non-seekable view of a stream (tar members in stream mode cannot report seekability)."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def is_archive(path):
+    """Returns True if the path names a tar or zip archive."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+def strip_compression_suffix(name):
+    """Returns the file name without a .gz/.xz/.bz2 suffix, e.g. 'ecss.yaml.gz' -> 'ecss.yaml'."""
+    for suffix in COMPRESSION_OPENERS:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def _buffered(name, stream):
+    """Wraps a binary stream in a peekable buffer, decompressing it if the name has a compression suffix."""
+    for suffix, compression_open in COMPRESSION_OPENERS.items():
+        if name.lower().endswith(suffix):
+            stream = compression_open(stream, 'rb')
+            break
+    return io.BufferedReader(stream, SNIFF_BYTES)
+
+def open_source_binary(path):
+    """Opens a source file as a buffered binary stream, decompressing .gz/.xz/.bz2 files on the fly."""
+    for suffix, compression_open in COMPRESSION_OPENERS.items():
+        if str(path).lower().endswith(suffix):
+            return io.BufferedReader(compression_open(path, 'rb'), SNIFF_BYTES)
+    return open(path, 'rb', buffering=SNIFF_BYTES)
+
+def iter_archive_members(path):
+    """
+    Yields (member_name, binary_stream) for the regular files of a tar or zip archive, in archive order.
+    Tar archives, compressed or not, are read in a single forward pass, so each stream must be
+    consumed before the next member is requested. Compressed members are decompressed on the fly.
+    """
+    if str(path).lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member_stream:
+                        yield info.filename, _buffered(info.filename, member_stream)
+        return
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, _buffered(member.name, _ForwardReader(archive.extractfile(member)))
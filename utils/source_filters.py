@@ -0,0 +1,97 @@
+# utils/source_filters.py
+
+from source_refs import SourceReferences, select_entities
+
+# Source fields that hold availability zones (a string or a list)
+AZ_FIELDS = ('az', 'availability_zone', 'masters_az', 'workers_az', 'available_az')
+
+def _strings(value):
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [item.strip() for item in values if isinstance(item, str) and item.strip()]
+
+def dc_name(value):
+    """Returns the DC name of a DC reference or AZ, e.g. 'tenant.dc.ru-moscow-1a' -> 'ru-moscow-1a'."""
+    return value.split('.dc.', 1)[1] if '.dc.' in value else value
+
+def entity_tenants(details):
+    """Returns the tenants of a source entity."""
+    return set(_strings(details.get('tenant')))
+
+def entity_azs(details):
+    """Returns the availability zones of a source entity, including those of RDS nodes."""
+    azs = set()
+    for field in AZ_FIELDS:
+        azs.update(_strings(details.get(field)))
+    for node in details.get('nodes') or []:
+        if isinstance(node, dict):
+            azs.update(_strings(node.get('availability_zone')))
+    return azs
+
+def entity_dcs(details):
+    """
+    Returns the DC names of a source entity: its 'DC' field and its availability zones,
+    since the converters create one DC per availability zone.
+    """
+    return {dc_name(value) for value in _strings(details.get('DC'))} | entity_azs(details)
+
+class EntityFilter:
+    """
+    Tenant / DC / AZ predicate for source entities. Each dimension accepts several values;
+    an entity matches a dimension if one of its values is listed.
+    """
+
+    def __init__(self, tenants=None, dcs=None, azs=None):
+        self.tenants = set(_strings(tenants or []))
+        self.dcs = {dc_name(value) for value in _strings(dcs or [])}
+        self.azs = set(_strings(azs or []))
+
+    def __bool__(self):
+        return bool(self.tenants or self.dcs or self.azs)
+
+    def describe(self):
+        """Returns the active conditions as text, e.g. 'tenant=a, az=ru-moscow-1a'."""
+        parts = []
+        for label, values in (('tenant', self.tenants), ('dc', self.dcs), ('az', self.azs)):
+            if values:
+                parts.append(f"{label}={'|'.join(sorted(values))}")
+        return ', '.join(parts)
+
+    def classify(self, details):
+        """
+        Returns True if the entity matches every active dimension, False if one of its values
+        contradicts a dimension, or None if it does not carry a value for some dimension
+        (e.g. subnets have no tenant) and can only be kept through references.
+        """
+        if not isinstance(details, dict):
+            return None
+        undecided = False
+        for wanted, extract in ((self.tenants, entity_tenants), (self.dcs, entity_dcs), (self.azs, entity_azs)):
+            if not wanted:
+                continue
+            values = extract(details)
+            if not values:
+                undecided = True
+            elif not values & wanted:
+                return False
+        return None if undecided else True
+
+    def apply(self, source_data):
+        """
+        Returns (filtered_data, matched, added): the source data reduced to the matching entities
+        plus what keeps it consistent across collections. Entities referenced by a kept entity are
+        kept even if they do not match themselves (subnets, VPCs and security groups of a kept
+        server), and entities without a value for a filtered field are kept if they reference a
+        kept entity. matched is the number of directly matching entities, added the number kept
+        through references.
+        """
+        references = SourceReferences(source_data)
+        seeds = []
+        undecided = []
+        for node in references.nodes():
+            decision = self.classify(source_data[node[0]][node[1]])
+            if decision:
+                seeds.append(node)
+            elif decision is None:
+                undecided.append(node)
+        kept = references.closure(seeds, adoptable=undecided)
+        return select_entities(source_data, kept), len(seeds), len(kept) - len(seeds)
@@ -0,0 +1,26 @@
+# utils/source_merge.py
+
+def report_duplicate(collection_key, entity_id, origin):
+    """Prints a warning about an entity ID defined by more than one source file."""
+    print(f"[WARNING] Duplicate entity '{entity_id}' in '{collection_key}' (again in {origin}). The later definition is used.")
+
+def merge_source_data(aggregated_data, data, origin, on_duplicate=report_duplicate):
+    """
+    Merges the parsed content of one source file into aggregated_data.
+    Entity dictionaries under the same top-level key are merged entity by entity, so a collection
+    can be split across several files. An entity ID that is already present is reported through
+    on_duplicate and replaced by the later definition; other top-level values are replaced.
+    Returns the number of duplicate entity IDs found.
+    """
+    duplicates = 0
+    for collection_key, entities in data.items():
+        existing = aggregated_data.get(collection_key)
+        if not (isinstance(existing, dict) and isinstance(entities, dict)):
+            aggregated_data[collection_key] = entities
+            continue
+        for entity_id, details in entities.items():
+            if entity_id in existing:
+                duplicates += 1
+                on_duplicate(collection_key, entity_id, origin)
+            existing[entity_id] = details
+    return duplicates
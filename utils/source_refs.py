@@ -0,0 +1,148 @@
+# utils/source_refs.py
+
+from collections import deque
+
+# Fields of a source entity that hold the ID(s) of entities of another collection,
+# by the short collection name (the last segment of the collection key)
+REFERENCE_FIELDS = {
+    'ecss': {'subnets': 'subnets', 'vpc_id': 'vpcs', 'security_groups': 'security_groups'},
+    'subnets': {'vpc': 'vpcs'},
+    'cces': {'subnet_id': 'subnets', 'vpc_id': 'vpcs', 'security_groups': 'security_groups'},
+    'rdss': {'subnet_id': 'subnets', 'vpc_id': 'vpcs', 'security_groups': 'security_groups'},
+    'dmss': {'subnet_id': 'subnets', 'vpc_id': 'vpcs', 'security_groups': 'security_groups'},
+    'elbs': {'subnet_id': 'subnets', 'vpc_id': 'vpcs'},
+    'nat_gateways': {'subnet_id': 'subnets', 'vpc_id': 'vpcs'},
+    'vpn_gateways': {'subnet_id': 'subnets', 'vpc_id': 'vpcs'},
+    'vpn_connections': {'gw_id': 'vpn_gateways', 'branch_id': 'branches'},
+    'peerings': {'request_vpc': 'vpcs', 'accept_vpc': 'vpcs'},
+    'vaults': {'resources': 'ecss'},
+}
+
+# Fields holding the internal IP addresses an EIP (int_address) can be bound to,
+# matching the owners eips_converter links to
+ADDRESS_FIELDS = {
+    'ecss': 'addresses',
+    'nat_gateways': 'address',
+    'elbs': 'address',
+}
+
+def collection_name(collection_key):
+    """Returns the short name of a collection key, e.g. 'seaf.ta.reverse.cloud_ru.advanced.ecss' -> 'ecss'."""
+    return collection_key.split('.')[-1]
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+def _reference_values(value):
+    """Returns the referenced IDs of a field value: a string, a list of strings or a list of {'id': ...} items."""
+    values = []
+    for item in _as_list(value):
+        if isinstance(item, dict):
+            item = item.get('id')
+        if isinstance(item, str) and item.strip():
+            values.append(item.strip())
+    return values
+
+class SourceReferences:
+    """
+    Reference graph of the entities of loaded source data.
+    Nodes are (collection_key, entity_key) pairs. A reference is resolved against the entity key,
+    its last segment or the entity's 'id' field, the same ways the converters resolve them.
+    EIPs reference the ECS, NAT gateway or ELB that owns their internal address.
+    """
+
+    def __init__(self, source_data):
+        self.source_data = source_data
+        self._collection_keys = {}
+        self._ids = {}
+        self._addresses = {}
+        for collection_key, entities in source_data.items():
+            if not isinstance(entities, dict):
+                continue
+            name = collection_name(collection_key)
+            self._collection_keys.setdefault(name, collection_key)
+            ids = self._ids.setdefault(name, {})
+            for entity_key, details in entities.items():
+                node = (collection_key, entity_key)
+                ids.setdefault(str(entity_key), node)
+                ids.setdefault(str(entity_key).split('.')[-1], node)
+                if isinstance(details, dict):
+                    if details.get('id'):
+                        ids.setdefault(str(details.get('id')), node)
+                    address_field = ADDRESS_FIELDS.get(name)
+                    if address_field:
+                        for address in _reference_values(details.get(address_field)):
+                            self._addresses.setdefault(address, []).append(node)
+
+    def nodes(self):
+        """Yields every (collection_key, entity_key) node of the source data."""
+        for collection_key, entities in self.source_data.items():
+            if isinstance(entities, dict):
+                for entity_key in entities:
+                    yield collection_key, entity_key
+
+    def resolve(self, target_name, value):
+        """Returns the node an ID refers to in the target collection, or None if it is not loaded."""
+        ids = self._ids.get(target_name, {})
+        return ids.get(value) or ids.get(value.split('.')[-1])
+
+    def references(self, node):
+        """Returns the nodes referenced by the entity of a node, in field order and without duplicates."""
+        collection_key, entity_key = node
+        details = self.source_data[collection_key][entity_key]
+        if not isinstance(details, dict):
+            return []
+        name = collection_name(collection_key)
+        referenced = []
+        for field, target_name in REFERENCE_FIELDS.get(name, {}).items():
+            for value in _reference_values(details.get(field)):
+                target = self.resolve(target_name, value)
+                if target and target != node and target not in referenced:
+                    referenced.append(target)
+        if name == 'eips':
+            for address in _reference_values(details.get('int_address')):
+                for target in self._addresses.get(address, []):
+                    if target not in referenced:
+                        referenced.append(target)
+        return referenced
+
+    def closure(self, seeds, adoptable=()):
+        """
+        Returns the set of nodes reachable from seeds by following references.
+        A node in adoptable is also added when it references a node of the result, so entities
+        that only point at kept entities (a subnet of a kept VPC, an EIP of a kept server) are kept too.
+        """
+        referrers = {}
+        for node in adoptable:
+            for target in self.references(node):
+                referrers.setdefault(target, []).append(node)
+
+        selected = set(seeds)
+        queue = deque(selected)
+        while queue:
+            node = queue.popleft()
+            for related in self.references(node) + referrers.get(node, []):
+                if related not in selected:
+                    selected.add(related)
+                    queue.append(related)
+        return selected
+
+def select_entities(source_data, nodes):
+    """
+    Returns a copy of source_data that only contains the entities of the given nodes.
+    Entity order is kept, collections stay present even if empty and non-collection values are kept as is.
+    """
+    selected = {}
+    for collection_key, entities in source_data.items():
+        if isinstance(entities, dict):
+            selected[collection_key] = {
+                entity_key: details for entity_key, details in entities.items()
+                if (collection_key, entity_key) in nodes
+            }
+        else:
+            selected[collection_key] = entities
+    return selected
@@ -0,0 +1,56 @@
+# utils/source_sample.py
+
+import random
+
+from source_refs import SourceReferences, select_entities
+
+class SourceSample:
+    """
+    Reproducible subset of source data for quick test runs: count entities (or a fraction)
+    of every collection, picked with a random generator seeded per collection.
+    """
+
+    def __init__(self, count=None, fraction=None, seed=0):
+        if count is not None and count < 0:
+            raise ValueError("Sample size must not be negative")
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError("Sample fraction must be in (0, 1]")
+        self.count = count
+        self.fraction = fraction
+        self.seed = seed
+
+    def __bool__(self):
+        return self.count is not None or self.fraction is not None
+
+    def describe(self):
+        """Returns the sample settings as text, e.g. '10 per collection, seed 0'."""
+        size = f"{self.count} per collection" if self.count is not None else f"{self.fraction:g} of each collection"
+        return f"{size}, seed {self.seed}"
+
+    def sample_size(self, total):
+        """Returns the number of entities picked from a collection of the given size."""
+        if self.count is not None:
+            return min(self.count, total)
+        return min(total, max(1, round(total * self.fraction))) if total else 0
+
+    def pick(self, collection_key, entity_keys):
+        """
+        Returns the picked entity keys of one collection. The generator is seeded with the seed and
+        the collection key, so a collection's pick does not depend on the other collections.
+        """
+        rng = random.Random(f"{self.seed}:{collection_key}")
+        return rng.sample(list(entity_keys), self.sample_size(len(entity_keys)))
+
+    def apply(self, source_data):
+        """
+        Returns (sampled_data, picked, added): the picked entities plus everything they reference,
+        so the sample stays consistent (ECS -> subnet -> VPC, EIP -> owner; see SourceReferences).
+        picked is the number of sampled entities, added the number kept through references.
+        """
+        references = SourceReferences(source_data)
+        seeds = []
+        for collection_key, entities in source_data.items():
+            if isinstance(entities, dict):
+                seeds.extend((collection_key, entity_key) for entity_key in self.pick(collection_key, entities))
+        kept = references.closure(seeds)
+        return select_entities(source_data, kept), len(seeds), len(kept) - len(seeds)
@@ -0,0 +1,99 @@
+# utils/source_stream.py
+
+import yaml
+from yaml.events import (
+    AliasEvent, ScalarEvent, SequenceStartEvent, SequenceEndEvent,
+    MappingStartEvent, MappingEndEvent, StreamStartEvent, StreamEndEvent, DocumentStartEvent
+)
+from yaml.nodes import ScalarNode, SequenceNode, MappingNode
+
+def _compose_node(loader, anchors):
+    """
+    Builds one YAML node from the loader's event stream.
+    This mirrors yaml.composer.Composer.compose_node, which the LibYAML parser does not expose,
+    so entity-sized nodes can be composed with both backends.
+    """
+    event = loader.get_event()
+    if isinstance(event, AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(None, None, f"found undefined alias {event.anchor!r}", event.start_mark)
+        return anchors[event.anchor]
+
+    if isinstance(event, ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(ScalarNode, event.value, event.implicit)
+        node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        return node
+
+    if isinstance(event, SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(SequenceNode, None, event.implicit)
+        node = SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(SequenceEndEvent):
+            node.value.append(_compose_node(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+        return node
+
+    if isinstance(event, MappingStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(MappingNode, None, event.implicit)
+        node = MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(MappingEndEvent):
+            item_key = _compose_node(loader, anchors)
+            item_value = _compose_node(loader, anchors)
+            node.value.append((item_key, item_value))
+        node.end_mark = loader.get_event().end_mark
+        return node
+
+    raise yaml.composer.ComposerError(None, None, f"unexpected event {event}", event.start_mark)
+
+def _construct(loader, node):
+    """Constructs a Python object from a node and drops the constructor's per-object state."""
+    data = loader.construct_object(node, deep=True)
+    loader.constructed_objects = {}
+    loader.recursive_objects = {}
+    return data
+
+def iter_yaml_entities(stream, collection_key, loader_class=yaml.SafeLoader):
+    """
+    Yields (entity_id, details) pairs of one top-level collection from a YAML stream.
+    Only a single entity is composed and constructed at a time, so memory use does not grow
+    with the size of the collection. Other top-level keys are composed and discarded.
+    Works with yaml.SafeLoader and yaml.CSafeLoader.
+    """
+    loader = loader_class(stream)
+    anchors = {}
+    try:
+        if not loader.check_event(StreamStartEvent):
+            return
+        loader.get_event()
+        if loader.check_event(StreamEndEvent):
+            return
+        if not loader.check_event(DocumentStartEvent):
+            return
+        loader.get_event()
+        if not loader.check_event(MappingStartEvent):
+            return
+        loader.get_event()
+        while not loader.check_event(MappingEndEvent):
+            key = _construct(loader, _compose_node(loader, anchors))
+            if key != collection_key or not loader.check_event(MappingStartEvent):
+                _compose_node(loader, anchors)
+                continue
+            loader.get_event()
+            while not loader.check_event(MappingEndEvent):
+                entity_id = _construct(loader, _compose_node(loader, anchors))
+                details = _construct(loader, _compose_node(loader, anchors))
+                yield entity_id, details
+            loader.get_event()
+    finally:
+        loader.dispose()
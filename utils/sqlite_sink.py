@@ -0,0 +1,122 @@
+# utils/sqlite_sink.py
+
+import sqlite3
+from itertools import islice
+
+from output_writer import to_json
+
+# Supported --sink schemes, given as <scheme>:<path>
+SINK_SCHEMES = ('sqlite',)
+
+# Entity fields extracted into indexed columns
+INDEXED_FIELDS = ('location', 'segment', 'az', 'external_id')
+
+# Rows passed to one executemany() call
+DEFAULT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    target_type TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    location TEXT,
+    segment TEXT,
+    az TEXT,
+    external_id TEXT,
+    PRIMARY KEY (target_type, entity_id)
+);
+CREATE TABLE IF NOT EXISTS entity_fields (
+    target_type TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entities_location ON entities (location);
+CREATE INDEX IF NOT EXISTS entities_segment ON entities (segment);
+CREATE INDEX IF NOT EXISTS entities_az ON entities (az);
+CREATE INDEX IF NOT EXISTS entities_external_id ON entities (external_id);
+CREATE INDEX IF NOT EXISTS entity_fields_value ON entity_fields (field, value);
+CREATE INDEX IF NOT EXISTS entity_fields_entity ON entity_fields (target_type, entity_id);
+"""
+
+UPSERT_ENTITY = """
+INSERT INTO entities (target_type, entity_id, body, location, segment, az, external_id)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (target_type, entity_id) DO UPDATE SET
+    body = excluded.body, location = excluded.location, segment = excluded.segment,
+    az = excluded.az, external_id = excluded.external_id
+"""
+
+def parse_sink(spec):
+    """Splits a '<scheme>:<path>' sink specification into (scheme, path). Raises ValueError if it is invalid."""
+    scheme, separator, path = str(spec).partition(':')
+    if not separator or scheme not in SINK_SCHEMES or not path:
+        raise ValueError(f"Invalid sink '{spec}'. Expected <scheme>:<path> with scheme one of: {', '.join(SINK_SCHEMES)}")
+    return scheme, path
+
+def field_values(entity, field):
+    """
+    Returns the non-empty values of an entity field as strings: a reference list gives all of its
+    items. Network segments keep their location under 'sber'.
+    """
+    value = entity.get(field)
+    if value is None and field == 'location' and isinstance(entity.get('sber'), dict):
+        value = entity['sber'].get('location')
+    values = value if isinstance(value, list) else [value]
+    return [str(item) for item in values if item not in (None, '') and not isinstance(item, (dict, list))]
+
+def _iter_entities(files):
+    for data in files.values():
+        for target_type, entities in data.items():
+            if not isinstance(entities, dict):
+                continue
+            for entity_id, entity in entities.items():
+                yield target_type, str(entity_id), entity if isinstance(entity, dict) else {}, entity
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def write_sqlite_sink(db_path, files, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upserts every entity of the converted files ({file_name: {target_type: {entity_id: entity}}})
+    into the SQLite database at db_path, one row per entity in the entities table: the target type,
+    the ID, the entity as JSON (see output_writer.to_json()) and the first value of each of
+    INDEXED_FIELDS in an indexed column.
+    Every value of those fields, e.g. all locations of a device spanning two AZs, also goes to the
+    indexed entity_fields table. Rows are written with executemany() in batches of batch_size,
+    all in a single transaction. Returns the number of entities written.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.executescript(SCHEMA)
+        count = 0
+        with connection:
+            for batch in _batches(_iter_entities(files), batch_size):
+                entity_rows = []
+                field_rows = []
+                for target_type, entity_id, fields, entity in batch:
+                    columns = []
+                    for field in INDEXED_FIELDS:
+                        values = field_values(fields, field)
+                        columns.append(values[0] if values else None)
+                        field_rows.extend((target_type, entity_id, field, value) for value in values)
+                    body = to_json(entity)
+                    entity_rows.append((target_type, entity_id, body, *columns))
+                connection.executemany(UPSERT_ENTITY, entity_rows)
+                # Field values of upserted entities are replaced, not added to
+                connection.executemany(
+                    "DELETE FROM entity_fields WHERE target_type = ? AND entity_id = ?",
+                    [row[:2] for row in entity_rows]
+                )
+                connection.executemany(
+                    "INSERT INTO entity_fields (target_type, entity_id, field, value) VALUES (?, ?, ?, ?)", field_rows
+                )
+                count += len(entity_rows)
+    finally:
+        connection.close()
+    return count
@@ -7,9 +7,11 @@ COLOR_YELLOW = '\033[93m'
 COLOR_BLUE = '\033[94m'
 COLOR_RESET = '\033[0m'
 
-def generate_summary(conversion_results, skipped_entities, failed_conversions):
+def generate_summary(conversion_results, skipped_entities, failed_conversions, output_counts=None):
     """
     Generates and prints a detailed analytical summary of the conversion process.
+    output_counts ({'written': N, 'unchanged': M}) reports how many output files were rewritten
+    and how many were already up to date.
     """
     print(f"\n{COLOR_BLUE}--- Analytical Summary ---{COLOR_RESET}")
 
@@ -102,4 +104,9 @@ def generate_summary(conversion_results, skipped_entities, failed_conversions):
         for discrepancy in detailed_discrepancies:
             print(discrepancy)
     
+    # --- Output Files ---
+    if output_counts is not None:
+        print(f"\n{COLOR_BLUE}Output Files:{COLOR_RESET}")
+        print(f"  Written: {output_counts.get('written', 0)}, unchanged: {output_counts.get('unchanged', 0)}")
+
     print(f"\n{COLOR_BLUE}--- End of Summary ---{COLOR_RESET}")
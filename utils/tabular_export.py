@@ -0,0 +1,149 @@
+# utils/tabular_export.py
+
+import csv
+import os
+
+from file_io import write_output_file
+
+# Supported table formats and their field delimiters
+TABLE_FORMATS = {'csv': ',', 'tsv': '\t'}
+
+SERVER_TARGET = 'seaf.ta.components.server'
+NETWORK_TARGET = 'seaf.ta.services.network'
+
+# Separator of the items of a reference list in one cell
+LIST_SEPARATOR = ';'
+
+def _to_int(value):
+    """Returns a number-like value as an int, or None (an empty cell) if it is not a number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def _to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(str(item) for item in value if item is not None)
+    return str(value)
+
+# Columns as (header, field path in the entity, type); the entity ID is always the first column
+SERVER_COLUMNS = (
+    ('title', ('title',), _to_text),
+    ('external_id', ('external_id',), _to_text),
+    ('fqdn', ('fqdn',), _to_text),
+    ('os_type', ('os', 'type'), _to_text),
+    ('os_bit', ('os', 'bit'), _to_int),
+    ('cpu_cores', ('cpu', 'cores'), _to_int),
+    ('cpu_frequency_mhz', ('cpu', 'frequency'), _to_int),
+    ('ram_gb', ('ram',), _to_int),
+    ('nic_qty', ('nic_qty',), _to_int),
+    ('az', ('az',), _to_text),
+    ('location', ('location',), _to_text),
+    ('subnets', ('subnets',), _to_text),
+)
+DISK_COLUMNS = (
+    ('size_gb', ('size',), _to_int),
+    ('type', ('type',), _to_text),
+    ('device', ('device',), _to_text),
+    ('az', ('az',), _to_text),
+)
+NETWORK_COLUMNS = (
+    ('title', ('title',), _to_text),
+    ('external_id', ('external_id',), _to_text),
+    ('type', ('type',), _to_text),
+    ('lan_type', ('lan_type',), _to_text),
+    ('cidr', ('ipnetwork',), _to_text),
+    ('wan_ip', ('wan_ip',), _to_text),
+    ('segment', ('segment',), _to_text),
+)
+
+def table_file_name(table_name, table_format):
+    return f"{table_name}.{table_format}"
+
+def _field(entity, path):
+    for key in path:
+        if not isinstance(entity, dict):
+            return None
+        entity = entity.get(key)
+    return entity
+
+def _row(entity, columns):
+    return [convert(_field(entity, path)) for _, path, convert in columns]
+
+def _iter_target_entities(files, target_key):
+    """Yields (entity_id, entity) pairs of one target type from all converted files, in file name order."""
+    for file_name in sorted(files):
+        entities = files[file_name].get(target_key)
+        if isinstance(entities, dict):
+            for entity_id, entity in entities.items():
+                yield entity_id, entity if isinstance(entity, dict) else {}
+
+def _table_writer(stream, table_format):
+    return csv.writer(stream, delimiter=TABLE_FORMATS[table_format], lineterminator='\n')
+
+def write_server_tables(server_stream, disk_stream, files, table_format='csv'):
+    """
+    Writes servers and their disks as two tables in a single pass over the servers: one row per
+    server, with the disk count and total disk size, and one row per disk keyed by the server ID
+    and the disk position. Returns the number of servers and disks written.
+    """
+    servers = _table_writer(server_stream, table_format)
+    disks = _table_writer(disk_stream, table_format)
+    servers.writerow(['id'] + [header for header, _, _ in SERVER_COLUMNS] + ['disk_count', 'disk_total_gb'])
+    disks.writerow(['server_id', 'disk_index'] + [header for header, _, _ in DISK_COLUMNS])
+    server_count = disk_count = 0
+    for entity_id, entity in _iter_target_entities(files, SERVER_TARGET):
+        server_disks = [disk for disk in entity.get('disks') or [] if isinstance(disk, dict)]
+        total_size = 0
+        for disk_index, disk in enumerate(server_disks):
+            disks.writerow([entity_id, disk_index] + _row(disk, DISK_COLUMNS))
+            total_size += _to_int(disk.get('size')) or 0
+        servers.writerow([entity_id] + _row(entity, SERVER_COLUMNS) + [len(server_disks), total_size])
+        server_count += 1
+        disk_count += len(server_disks)
+    return server_count, disk_count
+
+def write_network_table(stream, files, table_format='csv'):
+    """Writes one row per network with its CIDR (or WAN address) and segments. Returns the number of rows."""
+    writer = _table_writer(stream, table_format)
+    writer.writerow(['id'] + [header for header, _, _ in NETWORK_COLUMNS])
+    count = 0
+    for entity_id, entity in _iter_target_entities(files, NETWORK_TARGET):
+        writer.writerow([entity_id] + _row(entity, NETWORK_COLUMNS))
+        count += 1
+    return count
+
+def save_tables(output_dir, files, table_format='csv'):
+    """
+    Exports servers (servers, server_disks) and networks from the converted files
+    ({file_name: {target_key: {entity_id: entity}}}) to <table>.<csv|tsv> files in output_dir.
+    Each file is only rewritten if its content changes. Returns (file_name, row_count, changed)
+    triples.
+    """
+    results = []
+    server_name = table_file_name('servers', table_format)
+    disk_name = table_file_name('server_disks', table_format)
+    counts = {}
+
+    def write_servers(server_stream):
+        # The disk table is written while the servers are, so the servers are read once
+        def write_disks(disk_stream):
+            counts['servers'], counts['disks'] = write_server_tables(server_stream, disk_stream, files, table_format)
+        counts['disks_changed'] = write_output_file(os.path.join(output_dir, disk_name), write_disks)[1]
+
+    _, changed = write_output_file(os.path.join(output_dir, server_name), write_servers)
+    results.append((server_name, counts['servers'], changed))
+    results.append((disk_name, counts['disks'], counts['disks_changed']))
+
+    network_name = table_file_name('networks', table_format)
+
+    def write_networks(stream):
+        counts['networks'] = write_network_table(stream, files, table_format)
+
+    _, changed = write_output_file(os.path.join(output_dir, network_name), write_networks)
+    results.append((network_name, counts['networks'], changed))
+    return results